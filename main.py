@@ -1,14 +1,31 @@
+import argparse
+import contextlib
+import functools
+import gzip
+import hashlib
+import html
 import json
+import multiprocessing
+import os
+import re
 import sqlite3
+import threading
 import time
 import tkinter as tk
 import tkinter.ttk as ttk
-from tkinter import messagebox
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from tkinter import filedialog, messagebox
 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import requests
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
 
 # 模块的信息填写
 __author__ = "Nan"
@@ -18,6 +35,20 @@ __license__ = "None"
 # 默认的数据库存放路径
 db_path = 'data.db'
 
+# 国家统计局的各个源数据库（dbcode）。每个源数据库有独立的目录和独立的分区数据库文件，见 partition_path
+DATABASES = {
+    "hgyd": "月度数据",
+    "hgjd": "季度数据",
+    "hgnd": "年度数据",
+    "fsyd": "分省月度数据",
+    "fsjd": "分省季度数据",
+    "fsnd": "分省年度数据",
+}
+DEFAULT_DBCODE = "hgyd"
+# 分省数据库需要按地区（reg 维度）查询，未指定地区时查询北京市
+REGIONAL_DBCODE_PREFIX = "fs"
+DEFAULT_REGION = "110000"
+
 # 设置requests请求头，模拟浏览器访问
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 "
@@ -28,6 +59,7 @@ HEADERS = {
     'X-Requested-With': 'XMLHttpRequest'  # 表明这是一个AJAX请求，很多网站会检查这个
 }
 previous_results = []  # 用于存储上一次查询的结果
+current_dbcode = DEFAULT_DBCODE  # 界面中当前选择的源数据库
 
 # =============================================================
 #                       数据库初始化部分
@@ -35,7 +67,34 @@ previous_results = []  # 用于存储上一次查询的结果
 ROOT_ID = "zb"
 
 
+def partition_path(dbcode: str = DEFAULT_DBCODE) -> str:
+    """
+    Returns the SQLite file holding the partition of a source database.
+
+    Every source database is stored in its own file with the same schema, so dataset IDs that exist in several
+    source databases (e.g. `A0101` in both `hgyd` and `hgnd`) do not collide, and a query only ever touches the
+    partition it is about. The default database keeps using `db_path` itself, e.g. `data.db`, while the others
+    use `data_<dbcode>.db` next to it.
+
+    Raises:
+        ValueError: If `dbcode` is not one of `DATABASES`.
+    """
+    if dbcode not in DATABASES:
+        raise ValueError(f"未知的数据库: {dbcode}")
+    if dbcode == DEFAULT_DBCODE:
+        return db_path
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_{dbcode}{ext}"
+
+
+def is_regional(dbcode: str) -> bool:
+    """Returns whether a source database is a regional (分省) one, whose data is queried per region."""
+    return dbcode.startswith(REGIONAL_DBCODE_PREFIX)
+
+
 class TreeNode:
+    __slots__ = ("dataset_id", "name", "parent_id", "is_parent")
+
     def __init__(self, dataset_id: str, name: str, parent_id: str, is_parent: bool):
         self.dataset_id = dataset_id
         self.name = name
@@ -43,7 +102,127 @@ class TreeNode:
         self.is_parent = is_parent
 
 
-def grabID(parent_id: str, id_dict: dict):
+class Catalog:
+    """
+    Catalog is a compact, immutable in-memory representation of the dataset hierarchy.
+
+    The nodes are stored column-wise and sorted by ID: every ID is held exactly once in a tuple and parents
+    are referenced by their index in it, the names are concatenated into a single string with their offsets
+    in an `array`, and the parent flags are kept in `bytes`. IDs are looked up by binary search, so no
+    per-node objects or dictionaries are kept. A single instance is shared by the crawl, the name lookups and
+    every `AutocompleteEntry` (see `get_catalog`).
+
+    The lowercase IDs and names of the leaf datasets are additionally joined into one search string, which
+    lets `search` find matches with `str.find` instead of lowering every entry on every keystroke.
+
+    Attributes:
+        ids (tuple[str]): The node IDs, sorted.
+        parents (array.array): The index of each node's parent, -1 for top-level nodes.
+        is_parent (bytes): 1 for categories, 0 for leaf datasets.
+        leaves (array.array): The indices of the leaf datasets, in ID order.
+    """
+
+    __slots__ = ("ids", "parents", "is_parent", "leaves", "_names", "_name_offsets", "_search_text",
+                 "_search_offsets")
+
+    def __init__(self, nodes):
+        """
+        Args:
+            nodes (Iterable[tuple[str, str, str, bool]]): The nodes as `(node_id, parent_id, name, is_parent)` tuples.
+        """
+        nodes = sorted(nodes, key=lambda node: node[0])
+        self.ids = tuple(node[0] for node in nodes)
+        self.parents = array("i", (self._find(node[1]) for node in nodes))
+        self.is_parent = bytes(1 if node[3] else 0 for node in nodes)
+        self.leaves = array("i", (index for index in range(len(nodes)) if not self.is_parent[index]))
+        self._names, self._name_offsets = self._join(node[2] for node in nodes)
+        # 每个叶子节点占一行 "id\tname"，offsets 记录每行的起始位置，用于把匹配位置映射回节点
+        self._search_text, self._search_offsets = self._join(
+            f"{self.ids[index]}\t{nodes[index][2]}".lower() for index in self.leaves)
+
+    @staticmethod
+    def _join(lines):
+        """Joins strings with newlines and returns the joined text and the start offset of every line."""
+        lines = list(lines)
+        offsets = array("i")
+        offset = 0
+        for line in lines:
+            offsets.append(offset)
+            offset += len(line) + 1
+        offsets.append(offset)
+        return "\n".join(lines), offsets
+
+    @classmethod
+    def from_tree_nodes(cls, id_dict: dict):
+        """Builds a catalog from the `TreeNode` dictionary filled by `grabID`."""
+        return cls((node.dataset_id, node.parent_id, node.name, node.is_parent) for node in id_dict.values())
+
+    def _find(self, node_id: str) -> int:
+        index = bisect_left(self.ids, node_id)
+        return index if index < len(self.ids) and self.ids[index] == node_id else -1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, node_id):
+        return self._find(node_id) != -1
+
+    def index(self, node_id: str) -> int:
+        """Returns the index of a node ID, raising KeyError if it does not exist."""
+        index = self._find(node_id)
+        if index == -1:
+            raise KeyError(node_id)
+        return index
+
+    def name_at(self, index: int) -> str:
+        return self._names[self._name_offsets[index]:self._name_offsets[index + 1] - 1]
+
+    def name(self, node_id: str) -> str:
+        return self.name_at(self.index(node_id))
+
+    def ancestors(self, node_id: str) -> list[int]:
+        """Returns the indices of the nodes from the top-level ancestor down to `node_id` itself."""
+        chain = []
+        index = self.index(node_id)
+        while index != -1:
+            chain.append(index)
+            index = self.parents[index]
+        return chain[::-1]
+
+    def full_name(self, node_id: str) -> str:
+        """Returns the full display name of a node, e.g. `价格指数 -> 居民消费价格指数`."""
+        return " -> ".join(self.name_at(index) for index in self.ancestors(node_id))
+
+    def path(self, node_id: str) -> str:
+        """Returns the materialized path of a node, e.g. `/A01/A0101/A010101/`.
+
+        Every node's path is a prefix of the paths of all its descendants, so a whole subtree can be selected
+        with a single range scan over an index on the path column.
+        """
+        return "/" + "".join(f"{self.ids[index]}/" for index in self.ancestors(node_id))
+
+    def search(self, text: str) -> list[int]:
+        """Returns the indices of the leaf datasets whose ID or name contains `text`, ignoring case."""
+        if not text:
+            return list(self.leaves)
+        text = text.lower()
+        search_text, offsets, leaves = self._search_text, self._search_offsets, self.leaves
+        if search_text.count(text) * 8 > len(leaves):
+            # 匹配很多时逐行检查更快，避免每个匹配都做一次二分查找
+            return [leaves[line] for line in range(len(leaves))
+                    if text in search_text[offsets[line]:offsets[line + 1]]]
+
+        hits = []
+        position = search_text.find(text)
+        while position != -1:
+            line = bisect_right(offsets, position) - 1
+            hits.append(leaves[line])
+            # 跳到下一行继续查找，避免同一行被重复匹配
+            position = search_text.find(text, offsets[line + 1])
+        return hits
+
+
+def grabID(parent_id: str, id_dict: dict, dbcode: str = DEFAULT_DBCODE):
     """
     Recursively fetches dataset IDs and their metadata from the National Bureau of Statistics API.
 
@@ -55,6 +234,7 @@ def grabID(parent_id: str, id_dict: dict):
         parent_id (str): The ID of the parent node to fetch child nodes for.
         id_dict (dict[str, TreeNode]): A dictionary to store the fetched nodes, where keys are node IDs
             and values are `TreeNode` objects.
+        dbcode (str): The source database whose catalog is fetched, see `DATABASES`.
 
     Raises:
         Exception: If the API request fails or returns a non-200 status code.
@@ -66,7 +246,7 @@ def grabID(parent_id: str, id_dict: dict):
     Returns:
         None
     """
-    url = f"https://data.stats.gov.cn/easyquery.htm?id={parent_id}&dbcode=hgyd&wdcode=zb&m=getTree"
+    url = f"https://data.stats.gov.cn/easyquery.htm?id={parent_id}&dbcode={dbcode}&wdcode=zb&m=getTree"
     response = requests.post(url, headers=HEADERS)
     print(f"Fetching data from {url}...")
     if response.status_code != 200:
@@ -80,73 +260,362 @@ def grabID(parent_id: str, id_dict: dict):
             is_parent=item["isParent"]
         )
         if item["isParent"]:
-            grabID(item["id"], id_dict)
+            grabID(item["id"], id_dict, dbcode)
 
     # Ensure the script doesn't run too fast and trigger anti-scraping measures
     time.sleep(0)
 
 
-def gen_full_name(dataset_id: str, id_dict: dict[str:TreeNode]) -> str:
-    """Generates the full name of a dataset ID.
+def crawl_catalog(dbcode: str = DEFAULT_DBCODE) -> Catalog:
+    """Crawls the whole dataset hierarchy of a source database with `grabID` and returns it as a compact `Catalog`."""
+    id_dict = {}
+    grabID(ROOT_ID, id_dict, dbcode)
+    return Catalog.from_tree_nodes(id_dict)
+
+
+# 目录种子快照：预先导出的目录，新数据库可以直接加载而无需完整爬取
+CATALOG_SEED_PATH = "catalog_seed.json.gz"
+# 格式 2 增加了 dbcode 字段；格式 1 的快照没有该字段，总是默认数据库的目录
+CATALOG_SEED_FORMAT = 2
+
+
+def seed_path_for(dbcode: str = DEFAULT_DBCODE) -> str:
+    """Returns the default seed snapshot file of a source database, e.g. `catalog_seed_hgnd.json.gz`."""
+    if dbcode == DEFAULT_DBCODE:
+        return CATALOG_SEED_PATH
+    return CATALOG_SEED_PATH.replace(".json.gz", f"_{dbcode}.json.gz")
+
+
+def export_catalog_seed(path: str = None, dbcode: str = DEFAULT_DBCODE) -> str:
+    """
+    Exports the catalog stored in the partition of a source database as a compressed seed snapshot.
+
+    The snapshot is gzip-compressed JSON holding the seed format, the source database, a version hash of the
+    catalog content, the export time and one `[node_id, parent_id, name, is_parent]` entry per node.
 
     Args:
-        dataset_id (str): The ID of the dataset to retrieve the full name for.
-        id_dict (dict[str, TreeNode]): A dictionary mapping dataset IDs to their corresponding TreeNode objects.
+        path (str): The file to write the snapshot to, defaults to `seed_path_for(dbcode)`.
+        dbcode (str): The source database whose catalog is exported.
 
     Raises:
-        ValueError: If the dataset ID does not exist in the provided dictionary.
+        sqlite3.Error: If the catalog cannot be read from the database.
 
     Returns:
-        str: The full name of the dataset ID, constructed by traversing its parent hierarchy.
+        str: The version hash of the exported catalog.
     """
-    if dataset_id not in id_dict:
-        raise ValueError(f"ID {self.dataset_id} 不存在于字典中。")
+    path = path or seed_path_for(dbcode)
+    conn = sqlite3.connect(partition_path(dbcode))
+    try:
+        nodes = conn.execute("""
+            SELECT node_id, parent_id, name, is_parent FROM catalog_nodes ORDER BY node_id
+        """).fetchall()
+    finally:
+        conn.close()
 
-    full_name = []
-    current_node = id_dict[dataset_id]
+    content = json.dumps(nodes, ensure_ascii=False, separators=(",", ":"))
+    version = hashlib.sha1(content.encode("utf-8")).hexdigest()
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "format": CATALOG_SEED_FORMAT,
+            "dbcode": dbcode,
+            "version": version,
+            "exported_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "root_id": ROOT_ID,
+            "nodes": nodes,
+        }, ensure_ascii=False, separators=(",", ":")))
+    print(f"Exported {len(nodes)} catalog nodes to {path} (version {version[:12]}).")
+    return version
+
+
+def load_catalog_seed(path: str = None, dbcode: str = DEFAULT_DBCODE) -> tuple[Catalog, str]:
+    """
+    Loads a seed snapshot written by `export_catalog_seed`.
 
-    while current_node:
-        full_name.append(current_node.name)
-        if current_node.parent_id in id_dict:
-            current_node = id_dict[current_node.parent_id]
-        else:
-            break
+    Raises:
+        ValueError: If the snapshot has an unsupported format, or belongs to another catalog root or another
+            source database than `dbcode`.
+
+    Returns:
+        tuple[Catalog, str]: The catalog of the snapshot and its version hash.
+    """
+    path = path or seed_path_for(dbcode)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        seed = json.load(f)
+    if seed.get("format") not in (1, CATALOG_SEED_FORMAT) or seed.get("root_id") != ROOT_ID \
+            or seed.get("dbcode", DEFAULT_DBCODE) != dbcode:
+        raise ValueError(f"无法识别的目录种子文件: {path}")
+    print(f"Loaded {len(seed['nodes'])} catalog nodes from seed {path} "
+          f"(version {seed['version'][:12]}, exported at {seed['exported_at']}).")
+    return Catalog(seed["nodes"]), seed["version"]
+
+
+def _load_initial_catalog(seed_path: str, dbcode: str = DEFAULT_DBCODE):
+    """Returns `(catalog, seed_version)`, loading the seed snapshot if there is one and crawling otherwise.
+
+    `seed_version` is None if the catalog was crawled.
+    """
+    if seed_path and os.path.exists(seed_path):
+        try:
+            return load_catalog_seed(seed_path, dbcode)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Failed to load catalog seed {seed_path} ({e}), crawling the catalog instead.")
+    return crawl_catalog(dbcode), None
+
+
+def _catalog_rows(catalog: Catalog) -> list[tuple]:
+    """Returns the `catalog_nodes` rows of a catalog, as `(node_id, parent_id, name, is_parent, depth, path)`."""
+    # 按 ID 排序时父节点总在子节点之前，因此可以直接复用父节点的路径
+    paths, rows = [], []
+    for index, node_id in enumerate(catalog.ids):
+        parent = catalog.parents[index]
+        parent_path = paths[parent] if parent != -1 and parent < index else None
+        path = parent_path + f"{node_id}/" if parent_path is not None else catalog.path(node_id)
+        paths.append(path)
+        rows.append((node_id, catalog.ids[parent] if parent != -1 else ROOT_ID, catalog.name_at(index),
+                     catalog.is_parent[index], path.count("/") - 1, path))
+    return rows
+
+
+def _dataset_rows(catalog: Catalog) -> list[tuple]:
+    """Returns the `datasets` rows of the leaf datasets of a catalog."""
+    return [(catalog.ids[index], catalog.name_at(index), catalog.full_name(catalog.ids[index]))
+            for index in catalog.leaves]
+
+
+def sync_catalog(dbcode: str = DEFAULT_DBCODE) -> tuple[int, int]:
+    """
+    Crawls the live catalog of a source database and applies the differences to the one stored in its partition.
+
+    New and changed nodes (including nodes whose path or full name changed because an ancestor changed) are
+    written, and nodes that no longer exist are removed, together with their `datasets` rows, unless data has been
+    stored for them. Cached query results are dropped, since their text holds the old full names. The `synced_at`
+    marker in `catalog_meta` is set in the same transaction, so a sync that is interrupted before it commits
+    is started again by the next `init_tables`.
+
+    Raises:
+        Exception: If the crawl fails.
+        sqlite3.Error: If an error occurs during database operations.
 
-    return " -> ".join(reversed(full_name))
+    Returns:
+        tuple[int, int]: The number of added or updated nodes and the number of removed nodes.
+    """
+    live = crawl_catalog(dbcode)
+    conn = sqlite3.connect(partition_path(dbcode))
+    try:
+        stored = {row[0]: row for row in conn.execute("""
+            SELECT node_id, parent_id, name, is_parent, depth, path FROM catalog_nodes
+        """).fetchall()}
+        changed = [row for row in _catalog_rows(live) if stored.get(row[0]) != row]
+        with_data = {row[0] for row in conn.execute("SELECT DISTINCT dataset_id FROM indicators").fetchall()}
+        removed = [(node_id,) for node_id in stored.keys() - set(live.ids) if node_id not in with_data]
+        stored_datasets = {row[0]: row for row in conn.execute("""
+            SELECT dataset_id, dataset_name, dataset_full_name FROM datasets
+        """).fetchall()}
+        live_datasets = _dataset_rows(live)
+        changed_datasets = [row for row in live_datasets if stored_datasets.get(row[0]) != row]
+        removed_datasets = [(dataset_id,) for dataset_id in stored_datasets.keys() - {row[0] for row in live_datasets}
+                            if dataset_id not in with_data]
+
+        conn.executemany("""
+            INSERT INTO catalog_nodes (node_id, parent_id, name, is_parent, depth, path)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(node_id) DO UPDATE SET parent_id=excluded.parent_id, name=excluded.name,
+                is_parent=excluded.is_parent, depth=excluded.depth, path=excluded.path
+        """, changed)
+        conn.executemany("DELETE FROM catalog_nodes WHERE node_id = ?", removed)
+        conn.executemany("""
+            INSERT INTO datasets (dataset_id, dataset_name, dataset_full_name) VALUES (?, ?, ?)
+            ON CONFLICT(dataset_id) DO UPDATE SET
+                dataset_name=excluded.dataset_name, dataset_full_name=excluded.dataset_full_name
+        """, changed_datasets)
+        conn.executemany("DELETE FROM datasets WHERE dataset_id = ?", removed_datasets)
+        _set_catalog_meta(conn, "synced_at", time.strftime("%Y-%m-%d %H:%M:%S"))
+        conn.commit()
+    finally:
+        conn.close()
+
+    if changed or removed or removed_datasets:
+        _catalogs.pop(dbcode, None)  # 下次 get_catalog 时重新加载
+        query_cache.clear()  # 缓存的结果文本包含旧的完整名称
+    print(f"Catalog sync of {dbcode} finished: {len(changed)} nodes added or updated, {len(removed)} nodes removed.")
+    return len(changed), len(removed)
 
 
-def init_tables():
+_sync_threads = []  # start_catalog_sync 启动的后台同步线程，见 wait_for_catalog_sync
+
+
+def start_catalog_sync(dbcode: str = DEFAULT_DBCODE) -> threading.Thread:
+    """Runs `sync_catalog` for a source database in a background daemon thread."""
+    def run():
+        try:
+            sync_catalog(dbcode)
+        except Exception as e:
+            print(f"Catalog sync of {dbcode} failed: {e}")
+
+    thread = threading.Thread(target=run, name=f"catalog-sync-{dbcode}", daemon=True)
+    thread.start()
+    _sync_threads.append(thread)
+    return thread
+
+
+def wait_for_catalog_sync(timeout: float = None) -> bool:
     """
-    Initializes the database tables if they do not already exist.
+    Waits for the background catalog syncs started by `start_catalog_sync`.
 
-    This function checks for the existence of the `datasets` and `data_points` tables
-    in the SQLite database. If the tables are not found, it creates them with the
-    appropriate schema.
+    The sync threads are daemon threads, so a short-lived command that exits earlier abandons them; the sync
+    is then retried on the next start (see `init_tables`).
 
-    Also, if the `datasets` table does not exist, it initializes it with dataset IDs and names
-    which are fetched from https://data.stats.gov.cn/easyquery.htm?id=zb&dbcode=hgyd&wdcode=zb&m=getTree
+    Args:
+        timeout (float): The maximum number of seconds to wait in total, or None to wait until they finish.
+
+    Returns:
+        bool: Whether all syncs have finished.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for thread in _sync_threads:
+        thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+    return not any(thread.is_alive() for thread in _sync_threads)
+
+
+def _set_catalog_meta(conn: sqlite3.Connection, key: str, value: str):
+    conn.execute("""
+        INSERT INTO catalog_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """, (key, value))
+
+
+def _table_exists(cursor: sqlite3.Cursor, table_name: str, table_type: str = "table") -> bool:
+    cursor.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type=? AND name=?
+    """, (table_type, table_name))
+    return cursor.fetchone() is not None
+
+
+# 把时间字符串转换为整数时间键的 SQL 表达式，与 period_key 的结果一致：
+# 年 "2024" -> 202400，月 "202401" -> 202401，季 "2024A" -> 202421
+PERIOD_KEY_SQL = """(CASE length({0})
+    WHEN 4 THEN CAST({0} AS INTEGER) * 100
+    WHEN 5 THEN CAST(substr({0}, 1, 4) AS INTEGER) * 100 + unicode(substr({0}, 5)) - 44
+    ELSE CAST({0} AS INTEGER) END)"""
+# 把整数时间键还原为时间字符串的 SQL 表达式，与 period_text 的结果一致
+PERIOD_TEXT_SQL = """(CASE
+    WHEN {0} % 100 = 0 THEN CAST({0} / 100 AS TEXT)
+    WHEN {0} % 100 > 20 THEN CAST({0} / 100 AS TEXT) || char({0} % 100 + 44)
+    ELSE CAST({0} AS TEXT) END)"""
+
+
+def _create_storage_tables(cursor: sqlite3.Cursor):
+    """Creates the normalized `indicators` and `observations` tables and the `ingest_log` if they do not exist yet."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS indicators (
+            indicator_id INTEGER PRIMARY KEY,
+            dataset_id TEXT NOT NULL,
+            region TEXT NOT NULL DEFAULT '',    -- Region code in regional databases, empty otherwise
+            name TEXT NOT NULL,                 -- Indicator name string
+            FOREIGN KEY (dataset_id) REFERENCES datasets(dataset_id),
+            UNIQUE(dataset_id, region, name)
+        );
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS observations (
+            indicator_id INTEGER NOT NULL,
+            period INTEGER NOT NULL,            -- Period key, see period_key()
+            value REAL,                         -- Floating-point value
+            FOREIGN KEY (indicator_id) REFERENCES indicators(indicator_id),
+            PRIMARY KEY (indicator_id, period)  -- Prevent duplicate data
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_log (
+            dataset_id TEXT NOT NULL,
+            region TEXT NOT NULL DEFAULT '',    -- Region code in regional databases, empty otherwise
+            period INTEGER NOT NULL,            -- Period key, see period_key()
+            fingerprint TEXT NOT NULL,          -- Fingerprint of the last ingested slice, see fingerprint_slice()
+            row_count INTEGER NOT NULL,         -- Number of data points in the slice
+            ingested_at TEXT NOT NULL,          -- Time of the last write to the slice
+            PRIMARY KEY (dataset_id, region, period)
+        ) WITHOUT ROWID;
+    ''')
+
+
+def _create_data_points_view(cursor: sqlite3.Cursor):
+    """Creates the `data_points` view, which presents the normalized tables in the original row layout.
+
+    Besides the original columns the view has a `region` column, which is empty outside regional databases.
+    """
+    cursor.execute(f"""
+        CREATE VIEW data_points (dataset_id, region, time, name, value) AS
+        SELECT i.dataset_id, i.region, {PERIOD_TEXT_SQL.format("o.period")}, i.name, o.value
+        FROM indicators i
+        JOIN observations o ON o.indicator_id = i.indicator_id
+    """)
+
+
+def _column_names(cursor: sqlite3.Cursor, table_name: str) -> list[str]:
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})").fetchall()]
+
+
+def _add_region_columns(cursor: sqlite3.Cursor):
+    """
+    Upgrades storage tables created before the `region` column existed.
+
+    `indicators` is rebuilt with the new unique key, keeping its indicator IDs so `observations` stays valid.
+    `ingest_log` only holds fingerprints, so it is recreated empty; the next fetch of a slice then compares
+    the values row by row once (see `store_data_points`). The `data_points` view is recreated on top.
+    """
+    if "region" in _column_names(cursor, "indicators"):
+        return
+    if _table_exists(cursor, "data_points", "view"):
+        cursor.execute("DROP VIEW data_points")
+    # 复制而不是重命名旧表，重命名会把 observations 的外键改为指向旧表
+    cursor.execute("CREATE TABLE indicators_without_region AS SELECT indicator_id, dataset_id, name FROM indicators")
+    cursor.execute("DROP TABLE indicators")
+    cursor.execute("DROP TABLE ingest_log")
+    _create_storage_tables(cursor)
+    cursor.execute("""
+        INSERT INTO indicators (indicator_id, dataset_id, region, name)
+        SELECT indicator_id, dataset_id, '', name FROM indicators_without_region
+    """)
+    cursor.execute("DROP TABLE indicators_without_region")
+
+
+def init_tables(seed_path: str = None, dbcode: str = DEFAULT_DBCODE):
+    """
+    Initializes the database tables of a source database's partition if they do not already exist.
+
+    This function checks for the existence of the `datasets`, `catalog_nodes`, `indicators` and `observations`
+    tables in the partition file of `dbcode` (see `partition_path`). If the tables are not found, it creates
+    them with the appropriate schema. Data points are read through the `data_points` view; a `data_points`
+    table left by an older version is converted with `migrate_storage`.
+
+    Also, if the `datasets` or `catalog_nodes` table does not exist, it initializes it with the dataset hierarchy
+    which is fetched from https://data.stats.gov.cn/easyquery.htm?id=zb&dbcode=<dbcode>&wdcode=zb&m=getTree
+    If a catalog seed snapshot exists at `seed_path`, the hierarchy is bulk-loaded from it instead, and the
+    live tree is synced in the background afterwards (see `sync_catalog`). The seed version is recorded in
+    `catalog_meta`, and the sync is started again on every call until it has committed once.
+
+    Args:
+        seed_path (str): The catalog seed snapshot to use, see `export_catalog_seed`. Defaults to
+            `seed_path_for(dbcode)`; an empty string disables seeding.
+        dbcode (str): The source database to initialize, see `DATABASES`.
 
     Raises:
         sqlite3.Error: If an error occurs during database operations.
     """
-    conn = sqlite3.connect(db_path)
+    if seed_path is None:
+        seed_path = seed_path_for(dbcode)
+    path = partition_path(dbcode)
+    conn = sqlite3.connect(path)
     cursor = conn.cursor()
+    legacy_storage, needs_sync = False, False
 
     try:
+        catalog, seed_version = None, None
+
         # Check if the `datasets` table exists, if not, create and initialize it
-        cursor.execute("""
-            SELECT name FROM sqlite_master
-            WHERE type='table' AND name='datasets'
-        """)
-        if cursor.fetchone() is None:
-            id_dict = {}
-            leaf_node_dict = {}
-            grabID(ROOT_ID, id_dict)
-
-            # Add leaves to leaf_node_dict
-            for node_id, node in id_dict.items():
-                if not node.is_parent:
-                    leaf_node_dict[node_id] = node
+        if not _table_exists(cursor, "datasets"):
+            catalog, seed_version = _load_initial_catalog(seed_path, dbcode)
 
             cursor.execute('''
                 CREATE TABLE datasets (
@@ -155,107 +624,1062 @@ def init_tables():
                     dataset_full_name TEXT       -- Full name of the dataset, can be used for display
                 );
             ''')
-            for leaf_node_id, leaf_node in leaf_node_dict.items():
-                # Check if the dataset already exists, if not, insert it
-                cursor.execute("SELECT dataset_id FROM datasets WHERE dataset_id = ?", (leaf_node_id,))
-                existing = cursor.fetchone()
-                if existing is None:
-                    cursor.execute("""
-                                   INSERT INTO datasets (dataset_id,dataset_name,dataset_full_name)
-                                   VALUES (?,?,?)
-                               """, (leaf_node_id, leaf_node.name, gen_full_name(leaf_node_id, id_dict)))
-
-        # Check if the `data_points` table exists, and create it if not
-        cursor.execute("""
-            SELECT name FROM sqlite_master
-            WHERE type='table' AND name='data_points'
-        """)
-        if cursor.fetchone() is None:
+            cursor.executemany("""
+                INSERT OR IGNORE INTO datasets (dataset_id, dataset_name, dataset_full_name)
+                VALUES (?, ?, ?)
+            """, _dataset_rows(catalog))
+
+        # Check if the `catalog_nodes` table exists, if not, create it and store the whole hierarchy
+        if not _table_exists(cursor, "catalog_nodes"):
+            if catalog is None:
+                catalog, seed_version = _load_initial_catalog(seed_path, dbcode)
+
+            cursor.execute('''
+                CREATE TABLE catalog_nodes (
+                    node_id TEXT PRIMARY KEY,
+                    parent_id TEXT NOT NULL,            -- ID of the parent node, ROOT_ID for top-level nodes
+                    name TEXT NOT NULL,                 -- Name of the node
+                    is_parent INTEGER NOT NULL,         -- 1 for categories, 0 for leaf datasets
+                    depth INTEGER NOT NULL,             -- 1 for top-level nodes
+                    path TEXT NOT NULL                  -- Materialized path, e.g. "/A01/A0101/A010101/"
+                );
+            ''')
+            cursor.execute("CREATE INDEX idx_catalog_nodes_path ON catalog_nodes(path)")
+            cursor.execute("CREATE INDEX idx_catalog_nodes_parent ON catalog_nodes(parent_id)")
+            cursor.executemany("""
+                INSERT INTO catalog_nodes (node_id, parent_id, name, is_parent, depth, path)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, _catalog_rows(catalog))
+
+        # Create the normalized data tables, and the `data_points` view on top of them.
+        # A `data_points` table from an older version is converted by `migrate_storage` below.
+        _create_storage_tables(cursor)
+        _add_region_columns(cursor)
+        legacy_storage = _table_exists(cursor, "data_points")
+        if not legacy_storage and not _table_exists(cursor, "data_points", "view"):
+            _create_data_points_view(cursor)
+
+        # Check if the `data_versions` table exists, and create it if not
+        if not _table_exists(cursor, "data_versions"):
+            cursor.execute('''
+                CREATE TABLE data_versions (
+                    dataset_id TEXT PRIMARY KEY,        -- Dataset ID, or ALL_DATASETS for the whole table
+                    version INTEGER NOT NULL            -- Bumped on every write to the dataset's data points
+                );
+            ''')
+
+        # Check if the `catalog_meta` table exists, and create it if not
+        if not _table_exists(cursor, "catalog_meta"):
             cursor.execute('''
-                CREATE TABLE data_points (
-                    dataset_id TEXT NOT NULL,
-                    time TEXT NOT NULL,                 -- Time string
-                    name TEXT NOT NULL,                 -- Indicator name string
-                    value REAL,                         -- Floating-point value
-                    FOREIGN KEY (dataset_id) REFERENCES datasets(dataset_id),
-                    UNIQUE(dataset_id, time, name)      -- Prevent duplicate data
+                CREATE TABLE catalog_meta (
+                    key TEXT PRIMARY KEY,               -- "seed_version" or "synced_at"
+                    value TEXT NOT NULL
                 );
             ''')
+        # 从种子初始化的目录在同步提交之前没有 synced_at 标记；爬取得到的目录本身就是最新的
+        if catalog is not None:
+            if seed_version is not None:
+                _set_catalog_meta(conn, "seed_version", seed_version)
+            else:
+                _set_catalog_meta(conn, "synced_at", time.strftime("%Y-%m-%d %H:%M:%S"))
+        meta = dict(cursor.execute("SELECT key, value FROM catalog_meta").fetchall())
+        needs_sync = "seed_version" in meta and "synced_at" not in meta
 
         conn.commit()
     except sqlite3.Error as e:
         print(f"Database Error: {e.args[0]}")
     finally:
-        print("Finished initializing database tables.")
+        print(f"Finished initializing database tables of {dbcode} ({path}).")
         conn.close()
 
+    if legacy_storage:
+        print("Found a data_points table in the old layout, migrating it to the compact layout...")
+        migrate_storage(path)
+    if needs_sync:
+        start_catalog_sync(dbcode)
 
-# =============================================================
-#                         数据处理部分
-# =============================================================
 
-def get_dataset_choices():
+# 同时爬取目录的源数据库数量上限，避免请求过于密集触发反爬虫
+CRAWL_MAX_WORKERS = 3
+
+
+def init_databases(dbcodes, max_workers: int = CRAWL_MAX_WORKERS):
+    """
+    Initializes the partitions of several source databases with `init_tables`.
+
+    The catalogs of different source databases are independent, so their crawls run concurrently in at most
+    `max_workers` threads; each partition is a separate file, so their writes do not block each other.
+
+    Args:
+        dbcodes (Iterable[str]): The source databases to initialize, see `DATABASES`.
+        max_workers (int): The maximum number of catalogs crawled at the same time.
+
+    Raises:
+        Exception: If the crawl of a catalog fails. The other databases are still initialized.
     """
-    Fetches all dataset information from the database and formats it for autocomplete functionality.
+    dbcodes = list(dict.fromkeys(dbcodes))
+    if len(dbcodes) == 1:
+        init_tables(dbcode=dbcodes[0])
+        return
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(dbcodes))), thread_name_prefix="crawl") as executor:
+        futures = {executor.submit(init_tables, None, dbcode): dbcode for dbcode in dbcodes}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Failed to initialize {futures[future]}: {e}")
+                errors.append(e)
+    if errors:
+        raise errors[0]
+
+
+# 迁移与基准测试的参数
+MIGRATION_BATCH_SIZE = 50000
+BENCHMARK_REPEATS = 5
+
+
+def _benchmark_queries(path: str) -> dict[str, float]:
+    """Times a few representative read queries against the `data_points` table or view of a database.
 
     Returns:
-        dict: A dictionary where keys are dataset IDs and values are dataset names, e.g., {'A0101': '国民经济核算', ...}.
+        dict[str, float]: The average time of each query in milliseconds.
     """
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT dataset_id, name FROM data_points LIMIT 1")
+        sample = cursor.fetchone()
+        if sample is None:
+            return {}
+        queries = {
+            "按数据集查询": ("SELECT dataset_id, time, name, value FROM data_points WHERE dataset_id = ? "
+                        "ORDER BY dataset_id", (sample[0],)),
+            "按名称查询": ("SELECT dataset_id, time, name, value FROM data_points WHERE name LIKE ? ORDER BY time",
+                      (f"%{sample[1][:4]}%",)),
+            "全部数据": ("SELECT dataset_id, time, name, value FROM data_points ORDER BY dataset_id", ()),
+        }
+        timings = {}
+        for label, (sql, parameters) in queries.items():
+            start = time.perf_counter()
+            for _ in range(BENCHMARK_REPEATS):
+                cursor.execute(sql, parameters).fetchall()
+            timings[label] = (time.perf_counter() - start) * 1000 / BENCHMARK_REPEATS
+        return timings
+    finally:
+        conn.close()
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT dataset_id, dataset_name FROM datasets")
-    all_indicators = cursor.fetchall()
-    conn.close()
 
-    # 格式化为所需的字典
-    return {indicator_id: indicator_name for indicator_id, indicator_name in all_indicators}
+def migrate_storage(path: str = None, batch_size: int = MIGRATION_BATCH_SIZE) -> dict:
+    """
+    Converts a `data_points` table in the old layout into the compact `indicators` / `observations` layout.
+
+    The old table repeats the dataset ID and the indicator name in every row and in its UNIQUE index. The new
+    layout stores every `(dataset_id, name)` pair once in `indicators` and the values in the `WITHOUT ROWID`
+    table `observations`, keyed by `(indicator_id, period)` with integer period keys.
 
+    The migration runs online: triggers mirror every write to the old table into the new tables while the
+    existing rows are copied over in batches of `batch_size`, each in its own short transaction. Only the
+    final swap, which replaces the old table with the `data_points` view, holds a write lock for longer.
 
-def get_full_name_by_id(dataset_id: str):
-    # Check if the dataset_id exists in the datasets table, and then get its full name
-    conn = sqlite3.connect(db_path)
+    Args:
+        path (str): The database file to migrate, defaults to `db_path`.
+        batch_size (int): The number of rows copied per transaction.
+
+    Raises:
+        sqlite3.Error: If an error occurs during database operations.
+
+    Returns:
+        dict: The file size in bytes and the query timings (see `_benchmark_queries`) before and after the
+            migration, or an empty dict if there was nothing to migrate.
+    """
+    path = path or db_path
+    conn = sqlite3.connect(path)
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-                            SELECT dataset_id, dataset_name, dataset_full_name
-                            FROM datasets
-                            WHERE dataset_id = ?
-                        """, (dataset_id,))
-        dataset = cursor.fetchall()
+        if not _table_exists(cursor, "data_points"):
+            print("The data_points table is already in the compact layout, nothing to migrate.")
+            return {}
+
+        report = {"size_before": os.path.getsize(path), "timings_before": _benchmark_queries(path)}
+
+        # step 1: create the new tables and mirror concurrent writes into them
+        _create_storage_tables(cursor)
+        for event in ("INSERT", "UPDATE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS data_points_migrate_{event.lower()} AFTER {event} ON data_points
+                BEGIN
+                    INSERT OR IGNORE INTO indicators (dataset_id, name) VALUES (NEW.dataset_id, NEW.name);
+                    INSERT INTO observations (indicator_id, period, value)
+                    VALUES ((SELECT indicator_id FROM indicators
+                             WHERE dataset_id = NEW.dataset_id AND region = '' AND name = NEW.name),
+                            {PERIOD_KEY_SQL.format("NEW.time")}, NEW.value)
+                    ON CONFLICT(indicator_id, period) DO UPDATE SET value = excluded.value;
+                END;
+            """)
+        conn.commit()
+
+        # step 2: copy the existing rows in batches
+        cursor.execute("SELECT COALESCE(MAX(rowid), 0) FROM data_points")
+        max_rowid = cursor.fetchone()[0]
+        for batch_start in range(0, max_rowid, batch_size):
+            batch = (batch_start, batch_start + batch_size)
+            cursor.execute("""
+                INSERT OR IGNORE INTO indicators (dataset_id, name)
+                SELECT DISTINCT dataset_id, name FROM data_points WHERE rowid > ? AND rowid <= ?
+            """, batch)
+            cursor.execute(f"""
+                INSERT INTO observations (indicator_id, period, value)
+                SELECT i.indicator_id, {PERIOD_KEY_SQL.format("d.time")}, d.value
+                FROM data_points d
+                JOIN indicators i ON i.dataset_id = d.dataset_id AND i.region = '' AND i.name = d.name
+                WHERE d.rowid > ? AND d.rowid <= ?
+                ON CONFLICT(indicator_id, period) DO UPDATE SET value = excluded.value
+            """, batch)
+            conn.commit()
+            print(f"Migrated rows up to {min(batch[1], max_rowid)} / {max_rowid}")
+
+        # step 3: swap the old table for the view in a single transaction
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("DROP TRIGGER data_points_migrate_insert")
+        cursor.execute("DROP TRIGGER data_points_migrate_update")
+        cursor.execute("DROP TABLE data_points")
+        _create_data_points_view(cursor)
+        conn.commit()
+
+        # step 4: give the space of the old table and its index back to the file system
+        cursor.execute("VACUUM")
+    finally:
+        conn.close()
+
+    report["size_after"] = os.path.getsize(path)
+    report["timings_after"] = _benchmark_queries(path)
+    print(f"File size: {report['size_before'] / 1024:.1f} KiB -> {report['size_after'] / 1024:.1f} KiB")
+    for label, before in report["timings_before"].items():
+        print(f"{label}: {before:.2f} ms -> {report['timings_after'].get(label, float('nan')):.2f} ms")
+    return report
+
+
+# =============================================================
+#                         界面响应监控部分
+# =============================================================
+
+# 主循环心跳间隔、判定为卡顿的延迟阈值（毫秒）以及每个处理函数保留的耗时样本数
+WATCHDOG_INTERVAL_MS = 100
+WATCHDOG_STALL_MS = 200
+WATCHDOG_SAMPLES = 1000
+WATCHDOG_MAX_STALLS = 200
+WATCHDOG_DUMP_PATH = "ui_latency.json"
+HEARTBEAT_NAME = "主循环心跳延迟"
+
+
+class UiWatchdog:
+    """
+    UiWatchdog measures how responsive the Tk main loop is and which callbacks block it.
+
+    A heartbeat is scheduled on the main loop with `after` every `interval_ms` milliseconds; the delay between
+    the time a heartbeat was due and the time it actually ran is the latency a user input would have seen.
+    Callbacks wrapped with `track` (or code blocks wrapped with `timed`) record their own run time. When a
+    heartbeat is late by more than `stall_ms`, a stall is recorded together with the handler responsible for
+    it: the innermost tracked handler that is still running if there is one (the heartbeat then runs in a
+    nested event loop, e.g. of a `messagebox` opened by the handler), otherwise the slowest tracked handler
+    that finished since the previous heartbeat.
+
+    Attributes:
+        interval_ms (int): The heartbeat interval in milliseconds.
+        stall_ms (float): The heartbeat delay in milliseconds above which a stall is recorded.
+        stalls (deque): The most recent stalls as dicts with the keys `time`, `lag_ms` and `handler`.
+    """
+
+    def __init__(self, interval_ms: int = WATCHDOG_INTERVAL_MS, stall_ms: float = WATCHDOG_STALL_MS,
+                 max_samples: int = WATCHDOG_SAMPLES, max_stalls: int = WATCHDOG_MAX_STALLS):
+        self.interval_ms = interval_ms
+        self.stall_ms = stall_ms
+        self.max_samples = max_samples
+        self.stalls = deque(maxlen=max_stalls)
+
+        self._lock = threading.Lock()
+        self._samples = {}  # name -> deque of durations in milliseconds
+        self._counts = {}  # name -> number of calls, including those no longer in the samples
+        self._since_beat = []  # (name, duration) of the callbacks run since the previous heartbeat
+        self._running = []  # names of the tracked handlers currently running on the main thread, innermost last
+        self._root = None
+        self._due = None
+
+    def start(self, root: tk.Misc):
+        """Starts sending heartbeats through the main loop of `root`."""
+        self._root = root
+        self._due = time.perf_counter() + self.interval_ms / 1000
+        root.after(self.interval_ms, self._heartbeat)
+
+    def _heartbeat(self):
+        now = time.perf_counter()
+        lag = max(0.0, (now - self._due) * 1000)
+        self._record(HEARTBEAT_NAME, lag)
+        with self._lock:
+            since_beat, self._since_beat = self._since_beat, []
+        if lag > self.stall_ms:
+            if self._running:
+                culprit = self._running[-1]
+            elif since_beat:
+                culprit = max(since_beat, key=lambda item: item[1])[0]
+            else:
+                culprit = "未跟踪的回调"
+            self.stalls.append({"time": time.strftime("%Y-%m-%d %H:%M:%S"), "lag_ms": round(lag, 1),
+                                "handler": culprit})
+        self._due = time.perf_counter() + self.interval_ms / 1000
+        self._root.after(self.interval_ms, self._heartbeat)
+
+    def _record(self, name: str, duration: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(duration)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    @contextlib.contextmanager
+    def timed(self, name: str):
+        """
+        Records the run time of the enclosed block under `name`.
+
+        Handlers that end in a modal dialog should only time the blocking work before it, since the dialog
+        stays open for as long as the user takes to close it.
+        """
+        # 只有在主线程中运行的回调才会阻塞主循环
+        on_main_thread = threading.current_thread() is threading.main_thread()
+        if on_main_thread:
+            self._running.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self._record(name, duration)
+            if on_main_thread:
+                self._running.pop()
+                with self._lock:
+                    self._since_beat.append((name, duration))
+
+    def track(self, name: str = None):
+        """Returns a decorator that records the run time of the decorated callback under `name`, see `timed`."""
+
+        def decorator(func):
+            label = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timed(label):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def _percentile(sorted_samples: list, q: float) -> float:
+        return sorted_samples[round(q * (len(sorted_samples) - 1))]
+
+    def stats(self) -> dict:
+        """Returns the call count and the p50, p99 and maximum latency in milliseconds of every tracked name."""
+        with self._lock:
+            snapshot = {name: (self._counts[name], sorted(samples)) for name, samples in self._samples.items()}
+        return {
+            name: {
+                "count": count,
+                "p50_ms": round(self._percentile(samples, 0.5), 2),
+                "p99_ms": round(self._percentile(samples, 0.99), 2),
+                "max_ms": round(samples[-1], 2),
+            }
+            for name, (count, samples) in snapshot.items()
+        }
+
+    def dump(self, path: str = WATCHDOG_DUMP_PATH) -> str:
+        """Writes the latency statistics and the recorded stalls to `path` as JSON and returns the path."""
+        report = {
+            "interval_ms": self.interval_ms,
+            "stall_ms": self.stall_ms,
+            "latency": self.stats(),
+            "stalls": list(self.stalls),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+
+
+ui_watchdog = UiWatchdog()
+
+
+# =============================================================
+#                         数据处理部分
+# =============================================================
+
+_catalogs = {}  # 进程内共享的目录对象，按源数据库区分，由 get_catalog 懒加载
+
+
+def load_catalog(dbcode: str = DEFAULT_DBCODE) -> Catalog:
+    """Loads the dataset hierarchy of a source database from its `catalog_nodes` table into a new `Catalog`."""
+    conn = sqlite3.connect(partition_path(dbcode))
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT node_id, parent_id, name, is_parent FROM catalog_nodes")
+        return Catalog(cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def get_catalog(dbcode: str = DEFAULT_DBCODE) -> Catalog:
+    """
+    Returns the shared `Catalog` of a source database, loading it from its partition on first use.
+
+    The same immutable instance serves the name lookups and every autocomplete widget.
+
+    Raises:
+        sqlite3.Error: If the catalog cannot be loaded from the database.
+    """
+    catalog = _catalogs.get(dbcode)
+    if catalog is None:
+        catalog = _catalogs[dbcode] = load_catalog(dbcode)
+    return catalog
+
+
+def get_full_name_by_id(dataset_id: str, dbcode: str = DEFAULT_DBCODE):
+    # Check if the dataset_id exists in the catalog, and then get its full name
+    try:
+        catalog = get_catalog(dbcode)
     except sqlite3.Error as e:
         messagebox.showerror("数据库错误", f"查询数据时出错: {e}")
         return ""
-    finally:
-        conn.close()
 
-    if len(dataset) == 0:
+    if dataset_id not in catalog:
         messagebox.showerror("错误", f"数据集ID {dataset_id} 不存在。")
         return ""
-    return dataset[0][2]
+    return catalog.full_name(dataset_id)
 
 
-def get_name_by_id(dataset_id: str):
-    # Check if the dataset_id exists in the datasets table, and then get its name
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+def get_name_by_id(dataset_id: str, dbcode: str = DEFAULT_DBCODE):
+    # Check if the dataset_id exists in the catalog, and then get its name
     try:
-        cursor.execute("""
-                            SELECT dataset_id, dataset_name, dataset_full_name
-                            FROM datasets
-                            WHERE dataset_id = ?
-                        """, (dataset_id,))
-        dataset = cursor.fetchall()
+        catalog = get_catalog(dbcode)
     except sqlite3.Error as e:
         messagebox.showerror("数据库错误", f"查询数据时出错: {e}")
         return ""
-    finally:
-        conn.close()
 
-    if len(dataset) == 0:
+    if dataset_id not in catalog:
         messagebox.showerror("错误", f"数据集ID {dataset_id} 不存在。")
         return ""
-    return dataset[0][1]
+    return catalog.name(dataset_id)
+
+
+def _subtree_range(cursor: sqlite3.Cursor, node_id: str):
+    """Returns the `[start, end)` path range covering the subtree of a catalog node, or None if it does not exist."""
+    cursor.execute("SELECT path FROM catalog_nodes WHERE node_id = ?", (node_id,))
+    result = cursor.fetchone()
+    if result is None:
+        return None
+    # 路径以 "/" 结尾，所有子孙节点的路径都位于 [path, path 去掉末尾 "/" 再加 "0") 之间
+    return result[0], result[0][:-1] + "0"
+
+
+def get_child_nodes(parent_id: str = ROOT_ID, dbcode: str = DEFAULT_DBCODE) -> list[tuple[str, str, bool]]:
+    """
+    Fetches the direct children of a catalog node.
+
+    Args:
+        parent_id (str): The ID of the parent node, defaults to the root of the catalog.
+        dbcode (str): The source database whose catalog is browsed.
+
+    Returns:
+        list[tuple[str, str, bool]]: The children as `(node_id, name, is_parent)` tuples, ordered by ID.
+    """
+    conn = sqlite3.connect(partition_path(dbcode))
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT node_id, name, is_parent
+            FROM catalog_nodes
+            WHERE parent_id = ?
+            ORDER BY node_id
+        """, (parent_id,))
+        return [(node_id, name, bool(is_parent)) for node_id, name, is_parent in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def get_subtree_leaves(node_id: str, dbcode: str = DEFAULT_DBCODE) -> list[tuple[str, str]]:
+    """
+    Fetches all leaf datasets under a catalog node using the materialized path index.
+
+    Args:
+        node_id (str): The ID of the catalog node, e.g. `A01`. A leaf node yields only itself.
+        dbcode (str): The source database whose catalog is searched.
+
+    Returns:
+        list[tuple[str, str]]: The leaf datasets as `(dataset_id, dataset_name)` tuples, ordered by path.
+            Empty if the node does not exist.
+    """
+    conn = sqlite3.connect(partition_path(dbcode))
+    try:
+        cursor = conn.cursor()
+        path_range = _subtree_range(cursor, node_id)
+        if path_range is None:
+            return []
+        cursor.execute("""
+            SELECT node_id, name
+            FROM catalog_nodes
+            WHERE path >= ? AND path < ? AND is_parent = 0
+            ORDER BY path
+        """, path_range)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def get_subtree_data(node_id: str, dbcode: str = DEFAULT_DBCODE,
+                     region: str = None) -> list[tuple[str, str, str, float]]:
+    """
+    Fetches all stored data points of the leaf datasets under a catalog node.
+
+    Args:
+        node_id (str): The ID of the catalog node, e.g. `A01`.
+        dbcode (str): The source database whose partition is queried.
+        region (str): The region whose data points are returned in a regional database, see `resolve_region`.
+
+    Returns:
+        list[tuple[str, str, str, float]]: The data points as `(dataset_id, time, name, value)` tuples,
+            in the same layout as the results of `retrieve_data`.
+    """
+    conn = sqlite3.connect(partition_path(dbcode))
+    try:
+        cursor = conn.cursor()
+        path_range = _subtree_range(cursor, node_id)
+        if path_range is None:
+            return []
+        cursor.execute("""
+            SELECT d.dataset_id, d.time, d.name, d.value
+            FROM catalog_nodes c
+            CROSS JOIN data_points d ON d.dataset_id = c.node_id  -- CROSS JOIN 保证先按路径索引查找子树
+            WHERE c.path >= ? AND c.path < ? AND d.region = ?
+            ORDER BY d.dataset_id, d.time
+        """, (*path_range, resolve_region(dbcode, region) or ""))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+# 爬取相关的参数：单个分片请求的超时时间、并发上限以及失败分片的重试次数
+REQUEST_TIMEOUT = 30
+FETCH_MAX_WORKERS = 4
+FETCH_MAX_RETRIES = 2
+FETCH_RETRY_BACKOFF = 1.0
+
+
+def _parse_period(period: str):
+    """Parses a single period string into `(kind, year, sub_period)`, or returns None if it is not a plain period.
+
+    Supported kinds are `"year"` (e.g. `2023`), `"month"` (e.g. `202305`) and `"quarter"` (e.g. `2023B`).
+    """
+    if re.fullmatch(r"\d{4}", period):
+        return "year", int(period), 0
+    if re.fullmatch(r"\d{4}(0[1-9]|1[0-2])", period):
+        return "month", int(period[:4]), int(period[4:])
+    if re.fullmatch(r"\d{4}[A-D]", period):
+        return "quarter", int(period[:4]), "ABCD".index(period[4]) + 1
+    return None
+
+
+def _format_period(kind: str, year: int, sub_period: int) -> str:
+    if kind == "month":
+        return f"{year}{sub_period:02d}"
+    if kind == "quarter":
+        return f"{year}{'ABCD'[sub_period - 1]}"
+    return str(year)
+
+
+def period_key(period: str) -> int:
+    """Converts a time string into the integer period key stored in `observations`.
+
+    Years map to `YYYY00`, months to `YYYYMM` and quarters to `YYYY21` ... `YYYY24`, so the keys sort
+    chronologically. `PERIOD_KEY_SQL` is the same conversion in SQL.
+
+    Raises:
+        ValueError: If the time string is not a year, month or quarter.
+    """
+    parsed = _parse_period(period)
+    if parsed is None:
+        raise ValueError(f"无法识别的时间: {period}")
+    kind, year, sub_period = parsed
+    return year * 100 + (sub_period + 20 if kind == "quarter" else sub_period)
+
+
+def period_text(key: int) -> str:
+    """Converts an integer period key back into its time string, the inverse of `period_key`."""
+    year, sub_period = divmod(key, 100)
+    if sub_period == 0:
+        return _format_period("year", year, 0)
+    if sub_period > 20:
+        return _format_period("quarter", year, sub_period - 20)
+    return _format_period("month", year, sub_period)
+
+
+def split_time_scope(time_scope: str) -> list[str]:
+    """Splits a time scope into per-year chunks that can be fetched independently.
+
+    Ranges such as `2000-`, `2000-2010` or `202003-202306` are split at year boundaries. Comma separated
+    lists are split into their items, and the plain periods of the same year are grouped back into one
+    chunk (e.g. `202401,202405,2023` becomes `2023` and `202401,202405`), so a long list of months costs one
+    request per year rather than one per month. An open range ends at the current year (or month/quarter).
+    Whole years are expressed as a plain year (`2021`), partial years as a sub range (`202003-202012`).
+    Scopes that cannot be split (e.g. `last13`) are returned unchanged as a single chunk; in a list they come
+    first, in their original order.
+
+    Args:
+        time_scope (str): The time scope entered by the user, e.g. `2000-`.
+
+    Returns:
+        list[str]: The chunks in chronological order. Fetching all of them yields the same data points
+            as fetching the original scope at once.
+    """
+    time_scope = time_scope.strip()
+    if "," in time_scope:
+        by_year, sub_ranges, chunks = {}, set(), []
+        for item in time_scope.split(","):
+            for chunk in split_time_scope(item) if item.strip() else []:
+                if _parse_period(chunk) is not None:
+                    by_year.setdefault(int(chunk[:4]), set()).add(chunk)
+                elif _parse_period(chunk.split("-")[0]) is not None:
+                    sub_ranges.add(chunk)
+                else:
+                    chunks.append(chunk)
+        # 分组后的年份与子区间按各自第一个时间排序
+        ordered = [",".join(sorted(periods, key=period_key)) for periods in by_year.values()] + list(sub_ranges)
+        ordered.sort(key=lambda chunk: period_key(re.split(r"[,-]", chunk)[0]))
+        return chunks + ordered
+
+    match = re.fullmatch(r"(\w+)-(\w*)", time_scope)
+    if match is None:
+        return [time_scope]
+
+    start = _parse_period(match.group(1))
+    if match.group(2):
+        end = _parse_period(match.group(2))
+    elif start is not None:
+        # 开放区间以当前时间为终点
+        now = time.localtime()
+        end = (start[0], now.tm_year, {"year": 0, "month": now.tm_mon, "quarter": (now.tm_mon - 1) // 3 + 1}[start[0]])
+    else:
+        end = None
+    if start is None or end is None or start[0] != end[0] or start[1:] > end[1:]:
+        return [time_scope]
+
+    kind = start[0]
+    if kind == "year":
+        return [str(year) for year in range(start[1], end[1] + 1)]
+
+    last_sub_period = 12 if kind == "month" else 4
+    chunks = []
+    for year in range(start[1], end[1] + 1):
+        first = start[2] if year == start[1] else 1
+        last = end[2] if year == end[1] else last_sub_period
+        if first == 1 and last == last_sub_period:
+            chunks.append(str(year))
+        elif first == last:
+            chunks.append(_format_period(kind, year, first))
+        else:
+            chunks.append(f"{_format_period(kind, year, first)}-{_format_period(kind, year, last)}")
+    return chunks
+
+
+def resolve_region(dbcode: str, region: str = None):
+    """Returns the region code to query in a source database: None for national ones, `DEFAULT_REGION` if unset."""
+    if not is_regional(dbcode):
+        return None
+    return region or DEFAULT_REGION
+
+
+def build_query_url(dataset_id: str, time_scope: str, dbcode: str = DEFAULT_DBCODE, region: str = None) -> str:
+    """Builds the QueryData URL for the given dataset ID and time scope in a source database.
+
+    Regional databases are queried for a single region (see `resolve_region`), which is fixed in `wds`.
+    """
+    # building URL with source_name and time_scope arguments
+    source_name_argument = '{"wdcode":"zb","valuecode":"' + dataset_id + '"}'
+    time_scope_argument = '{"wdcode":"sj","valuecode":"' + time_scope + '"}'
+    dfwds_argument = f"&dfwds=[{source_name_argument},{time_scope_argument}]"
+    time_argument = f'&k1={int(time.time())}&h=1'
+    region = resolve_region(dbcode, region)
+    wds_argument = "[]" if region is None else '[{"wdcode":"reg","valuecode":"' + region + '"}]'
+    base_url = (f"https://data.stats.gov.cn/easyquery.htm?m=QueryData&dbcode={dbcode}&rowcode=zb&colcode=sj"
+                f"&wds={wds_argument}")
+    return base_url + dfwds_argument + time_argument
+
+
+def query_data(dataset_id: str, time_scope: str, dbcode: str = DEFAULT_DBCODE,
+               region: str = None) -> list[tuple[str, str, float]]:
+    """
+    Sends a single QueryData request and parses the returned data points.
+
+    Args:
+        dataset_id (str): The ID of the dataset to query, e.g. `A01030H`.
+        time_scope (str): The time scope of the request, e.g. `2023` or `last13`.
+        dbcode (str): The source database to query, see `DATABASES`.
+        region (str): The region code to query in a regional database, see `resolve_region`.
+
+    Raises:
+        Exception: If the API request fails or returns a non-200 status code.
+        ValueError: If a data node lacks necessary time or name information.
+
+    Returns:
+        list[tuple[str, str, float]]: The data points as `(time, name, value)` tuples.
+    """
+    url = build_query_url(dataset_id, time_scope, dbcode, region)
+    response = requests.post(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch data from {url}, status code: {response.status_code}")
+
+    return_data = json.loads(response.text)["returndata"]
+
+    # read the node names from the JSON response and store them in a dict
+    node_name_dicts = {}
+    wdnodes = return_data["wdnodes"]
+    for wdnode in wdnodes:
+        wdcode = wdnode["wdcode"]
+        if wdcode not in node_name_dicts:
+            node_name_dicts[wdcode] = {}
+        nodes = wdnode["nodes"]
+        for node in nodes:
+            node_name_dicts[wdcode][node["code"]] = node["name"]
+
+    # transform the datanodes and transform the data
+    rows = []
+    datanodes = return_data["datanodes"]
+    for datanode in datanodes:
+        data = datanode["data"]["data"]
+        wds = datanode["wds"]
+        node_time, node_name = "", ""
+        for wd in wds:
+            if wd["wdcode"] == "zb":
+                node_name = node_name_dicts[wd["wdcode"]][wd["valuecode"]]
+            elif wd["wdcode"] == "sj":
+                node_time = wd["valuecode"]
+        if node_name == "" or node_time == "":
+            raise ValueError("数据节点缺少必要的时间或名称信息。")
+        rows.append((node_time, node_name, data))
+    return rows
+
+
+def _query_chunk(dataset_id: str, chunk: str, dbcode: str = DEFAULT_DBCODE,
+                 region: str = None) -> list[tuple[str, str, float]]:
+    """Queries a single chunk, retrying it on its own up to `FETCH_MAX_RETRIES` times before giving up."""
+    for attempt in range(FETCH_MAX_RETRIES + 1):
+        try:
+            return query_data(dataset_id, chunk, dbcode, region)
+        except Exception as e:
+            if attempt == FETCH_MAX_RETRIES:
+                raise
+            print(f"Chunk {chunk} of {dataset_id} failed ({e}), retrying...")
+            time.sleep(FETCH_RETRY_BACKOFF * (attempt + 1))
+
+
+# data_versions 表中代表整个 data_points 表的特殊键，任何数据集被写入时都会随之更新
+ALL_DATASETS = "*"
+
+
+def bump_data_version(conn: sqlite3.Connection, dataset_id: str):
+    """Bumps the data version of a dataset and of the whole table, in the caller's transaction."""
+    conn.executemany("""
+        INSERT INTO data_versions (dataset_id, version) VALUES (?, 1)
+        ON CONFLICT(dataset_id) DO UPDATE SET version = version + 1
+    """, [(dataset_id,), (ALL_DATASETS,)])
+
+
+def get_data_version(cursor: sqlite3.Cursor, dataset_id: str = ALL_DATASETS) -> int:
+    """Returns the current data version of a dataset, or of the whole table if no dataset is given."""
+    cursor.execute("SELECT version FROM data_versions WHERE dataset_id = ?", (dataset_id,))
+    result = cursor.fetchone()
+    return result[0] if result else 0
+
+
+def fingerprint_slice(pairs) -> str:
+    """Returns a fingerprint of the `(name, value)` pairs of one (dataset, period) slice, independent of their order."""
+    payload = json.dumps(sorted(pairs, key=lambda pair: pair[0]), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def store_data_points(conn: sqlite3.Connection, dataset_id: str, rows: list[tuple[str, str, float]],
+                      region: str = ""):
+    """
+    Stores the given `(time, name, value)` rows of a dataset, writing only what has changed, and commits them.
+
+    In regional databases `region` is the region code the rows belong to; slices, fingerprints and indicators
+    are kept per region, so fetching another region of the same dataset does not overwrite them.
+
+    The rows are grouped into one slice per period and every slice is fingerprinted (see `fingerprint_slice`).
+    A slice whose fingerprint matches the one recorded in `ingest_log` is skipped without any write. For the
+    other slices only the rows whose value differs from the stored one are written, and the new fingerprint
+    is recorded. The data version is only bumped if at least one row was written.
+
+    Returns:
+        tuple[int, int]: The number of rows written and the number of rows skipped because they were unchanged.
+    """
+    slices = {}
+    for node_time, node_name, data in rows:
+        slices.setdefault(period_key(node_time), {})[node_name] = data
+    if not slices:
+        return 0, 0
+
+    periods = list(slices)
+    placeholders = ",".join("?" * len(periods))
+    fingerprints = {period: fingerprint_slice(slices[period].items()) for period in periods}
+    logged = dict(conn.execute(f"""
+        SELECT period, fingerprint FROM ingest_log
+        WHERE dataset_id = ? AND region = ? AND period IN ({placeholders})
+    """, (dataset_id, region, *periods)).fetchall())
+
+    changed_periods = [period for period in periods if logged.get(period) != fingerprints[period]]
+    skipped = sum(len(slices[period]) for period in periods if period not in changed_periods)
+    if not changed_periods:
+        return 0, skipped
+
+    # look up (or create) the integer IDs of the indicators
+    conn.executemany("INSERT OR IGNORE INTO indicators (dataset_id, region, name) VALUES (?, ?, ?)",
+                     [(dataset_id, region, node_name) for node_name in {row[1] for row in rows}])
+    indicator_ids = dict(conn.execute("SELECT name, indicator_id FROM indicators WHERE dataset_id = ? AND region = ?",
+                                      (dataset_id, region)).fetchall())
+
+    # compare the changed slices with the stored values and keep only the rows that differ
+    placeholders = ",".join("?" * len(changed_periods))
+    stored_values = {(indicator_id, period): value for indicator_id, period, value in conn.execute(f"""
+        SELECT o.indicator_id, o.period, o.value
+        FROM indicators i
+        JOIN observations o ON o.indicator_id = i.indicator_id
+        WHERE i.dataset_id = ? AND i.region = ? AND o.period IN ({placeholders})
+    """, (dataset_id, region, *changed_periods)).fetchall()}
+    changes = []
+    for period in changed_periods:
+        for node_name, data in slices[period].items():
+            key = (indicator_ids[node_name], period)
+            if key in stored_values and stored_values[key] == data:
+                skipped += 1
+            else:
+                changes.append((*key, data))
+
+    # insert or update the changed data points in the observations table
+    conn.executemany("""
+        INSERT INTO observations (indicator_id, period, value)
+        VALUES (?, ?, ?)
+        ON CONFLICT(indicator_id, period) DO UPDATE SET value=excluded.value
+    """, changes)
+    conn.executemany("""
+        INSERT INTO ingest_log (dataset_id, region, period, fingerprint, row_count, ingested_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(dataset_id, region, period) DO UPDATE SET
+            fingerprint=excluded.fingerprint, row_count=excluded.row_count, ingested_at=excluded.ingested_at
+    """, [(dataset_id, region, period, fingerprints[period], len(slices[period]),
+           time.strftime("%Y-%m-%d %H:%M:%S")) for period in changed_periods])
+    if changes:
+        bump_data_version(conn, dataset_id)
+    conn.commit()
+    return len(changes), skipped
+
+
+# 推测性预取的参数：默认时间范围、并发上限、暂存区内存预算以及暂存数据的有效期（秒）
+PREFETCH_TIME_SCOPE = "last13"
+PREFETCH_MAX_CONCURRENT = 2
+PREFETCH_MAX_BYTES = 16 * 1024 * 1024
+PREFETCH_TTL = 300
+
+
+class Prefetcher:
+    """
+    Prefetcher speculatively fetches the default time scope of a dataset in the background.
+
+    When a dataset is selected, `request` starts fetching `time_scope` in a background thread and keeps the
+    parsed rows in a staging cache. A following `fetch_dataset` for the same dataset and time scope takes the
+    rows from there (see `take`) instead of waiting on the network. The staging cache is bounded by
+    `max_bytes`, and at most `max_concurrent` speculative requests run at the same time; further requests
+    are dropped rather than queued. Speculative requests are sent once without retries, so a failing one does
+    not hold a slot for long; the following fetch then queries the dataset itself. Staged rows older than
+    `ttl` seconds are discarded. Entries are keyed by source database, dataset and region, so the same dataset
+    ID selected in another database is fetched anew.
+
+    Attributes:
+        issued (int): The number of speculative requests started.
+        hits (int): The number of fetches served from the staging cache or from an in-flight request.
+        misses (int): The number of fetches of the default time scope that found nothing staged.
+        wasted (int): The number of staged results that were evicted, expired or failed without being used.
+    """
+
+    def __init__(self, time_scope: str = PREFETCH_TIME_SCOPE, max_concurrent: int = PREFETCH_MAX_CONCURRENT,
+                 max_bytes: int = PREFETCH_MAX_BYTES, ttl: float = PREFETCH_TTL):
+        self.time_scope = time_scope
+        self.max_concurrent = max_concurrent
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.issued = self.hits = self.misses = self.wasted = 0
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="prefetch")
+        self._in_flight = {}  # (dbcode, dataset_id, region) -> Future
+        self._running = set()  # 尚未完成的请求，包括已被 take 取走的，用于并发上限
+        self._staged = OrderedDict()  # (dbcode, dataset_id, region) -> (rows, size, fetched_at)
+        self._staged_bytes = 0
+
+    @staticmethod
+    def _estimate_size(rows: list) -> int:
+        """Roughly estimates the memory used by fetched rows."""
+        return sum(100 + 2 * (len(node_time) + len(node_name)) for node_time, node_name, _ in rows)
+
+    def request(self, dataset_id: str, dbcode: str = DEFAULT_DBCODE, region: str = None):
+        """Starts prefetching a dataset unless it is already staged, in flight, or the concurrency cap is reached."""
+        region = resolve_region(dbcode, region)
+        key = (dbcode, dataset_id, region)
+        with self._lock:
+            if key in self._staged or key in self._in_flight:
+                return
+            if len(self._running) >= self.max_concurrent:
+                return
+            self.issued += 1
+            future = self._executor.submit(query_data, dataset_id, self.time_scope, dbcode, region)
+            self._in_flight[key] = future
+            self._running.add(future)
+        future.add_done_callback(lambda f: self._on_done(key, f))
+
+    def _on_done(self, key: tuple, future):
+        """Moves the result of a finished request into the staging cache, evicting the oldest entries if needed."""
+        with self._lock:
+            self._running.discard(future)
+            if self._in_flight.get(key) is not future:
+                return  # 已被 take 取走
+            del self._in_flight[key]
+            # close 会取消尚未开始的请求，对已取消的 future 调用 exception() 会抛出 CancelledError
+            if future.cancelled() or future.exception() is not None:
+                self.wasted += 1
+                return
+            rows = future.result()
+            size = self._estimate_size(rows)
+            if size > self.max_bytes:
+                self.wasted += 1
+                return
+            self._staged[key] = (rows, size, time.monotonic())
+            self._staged_bytes += size
+            while self._staged_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._staged.popitem(last=False)
+                self._staged_bytes -= evicted_size
+                self.wasted += 1
+
+    def take(self, dataset_id: str, time_scope: str, dbcode: str = DEFAULT_DBCODE, region: str = None):
+        """
+        Returns the prefetched rows of a dataset if `time_scope` is the prefetched one, otherwise None.
+
+        An entry is handed out at most once. If the request is still in flight, this waits for it, which is
+        never slower than starting a new request.
+        """
+        if time_scope.strip().lower() != self.time_scope.lower():
+            return None
+        key = (dbcode, dataset_id, resolve_region(dbcode, region))
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+            entry = self._staged.pop(key, None)
+            if entry is not None:
+                self._staged_bytes -= entry[1]
+                if time.monotonic() - entry[2] > self.ttl:
+                    self.wasted += 1
+                    entry = None
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+        if future is not None:
+            try:
+                rows = future.result()
+            except Exception:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return rows
+        self.misses += 1
+        return None
+
+    def close(self):
+        """Stops the background thread pool, cancelling requests that have not started yet."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Returns the counters together with the hit rate and the current staging size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "issued": self.issued,
+                "hits": self.hits,
+                "misses": self.misses,
+                "wasted": self.wasted,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "staged": len(self._staged),
+                "staged_bytes": self._staged_bytes,
+            }
+
+
+prefetcher = None  # 启用推测性预取时为 Prefetcher 实例
+
+
+def fetch_dataset(dataset_id: str, time_scope: str, max_workers: int = FETCH_MAX_WORKERS,
+                  dbcode: str = DEFAULT_DBCODE, region: str = None):
+    """
+    Fetches a dataset of a source database for the given time scope and stores it in the partition of that database.
+
+    The time scope is split into per-year chunks (see `split_time_scope`) which are fetched concurrently by
+    at most `max_workers` threads. The rows of every chunk are committed as soon as that chunk finishes,
+    so a failing chunk does not lose the ones that already succeeded. Each failing chunk is retried on its own.
+    If speculative prefetching is enabled and the rows of the time scope were prefetched, they are taken from
+    the `prefetcher` instead of the network.
+
+    Args:
+        dataset_id (str): The ID of the dataset to fetch.
+        time_scope (str): The time scope entered by the user.
+        max_workers (int): The maximum number of concurrent requests.
+        dbcode (str): The source database of the dataset, see `DATABASES`.
+        region (str): The region code to fetch in a regional database, see `resolve_region`.
+
+    Raises:
+        ValueError: If the dataset ID does not exist in the database.
+        sqlite3.Error: If an error occurs during database operations.
+
+    Returns:
+        tuple[int, int, list[tuple[str, Exception]]]: The number of data points written, the number of data
+            points skipped because they were unchanged (see `store_data_points`), and the chunks that still
+            failed after all retries, together with their last error.
+    """
+    region = resolve_region(dbcode, region)
+    conn = sqlite3.connect(partition_path(dbcode))
+    try:
+        # Check if the dataset_id exists in the datasets table
+        if conn.execute("SELECT 1 FROM datasets WHERE dataset_id = ?", (dataset_id,)).fetchone() is None:
+            raise ValueError(f"数据集ID {dataset_id} 不存在于{DATABASES[dbcode]}数据库中，可能需要重新初始化数据库。")
+
+        written, skipped, failures = 0, 0, []
+        if prefetcher is not None:
+            rows = prefetcher.take(dataset_id, time_scope, dbcode, region)
+            if rows is not None:
+                written, skipped = store_data_points(conn, dataset_id, rows, region or "")
+                return written, skipped, failures
+
+        chunks = split_time_scope(time_scope)
+        # 网络请求在线程池中并发进行，数据库写入只在当前线程中进行
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+            futures = {executor.submit(_query_chunk, dataset_id, chunk, dbcode, region): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    failures.append((futures[future], e))
+                    continue
+                chunk_written, chunk_skipped = store_data_points(conn, dataset_id, rows, region or "")
+                written += chunk_written
+                skipped += chunk_skipped
+        return written, skipped, failures
+    finally:
+        conn.close()
 
 
 # 爬取数据并存入数据库
@@ -263,9 +1687,9 @@ def fetch_data():
     """
     Fetches data from the National Bureau of Statistics API and stores it in the SQLite database.
 
-    This function constructs a URL based on user input for dataset ID and time scope, sends a POST request
-    to the API, and processes the returned JSON data. The data is then inserted or updated in the `data_points`
-    table of the SQLite database.
+    This function reads the dataset ID, time scope and region from user input and hands them to `fetch_dataset`
+    together with the selected source database, which splits wide time scopes into chunks, fetches them in
+    parallel and inserts or updates the returned data in the `observations` table of that database's partition.
 
     Raises:
         Exception: If the API request fails or returns a non-200 status code.
@@ -277,70 +1701,110 @@ def fetch_data():
         None
     """
     dataset_id, time_scope = dataset_id_input.get(), time_scope_input.get()
-    conn = sqlite3.connect(db_path)
-
-    # building URL with source_name and time_scope arguments
-    source_name_argument = '{"wdcode":"zb","valuecode":"' + dataset_id + '"}'
-    time_scope_argument = '{"wdcode":"sj","valuecode":"' + time_scope + '"}'
-    dfwds_argument = f"&dfwds=[{source_name_argument},{time_scope_argument}]"
-    time_argument = f'&k1={int(time.time())}&h=1'
-    base_url = "https://data.stats.gov.cn/easyquery.htm?m=QueryData&dbcode=hgyd&rowcode=zb&colcode=sj&wds=[]"
-    url = base_url + dfwds_argument + time_argument
+    region = region_input.get().strip() or None
 
     try:
-        response = requests.post(url, headers=HEADERS)
-        if response.status_code != 200:
-            raise Exception(f"Failed to fetch data from {url}, status code: {response.status_code}")
-
-        return_data = json.loads(response.text)["returndata"]
-
-        # read the node names from the JSON response and store them in a dict
-        node_name_dicts = {}
-        wdnodes = return_data["wdnodes"]
-        for wdnode in wdnodes:
-            wdcode = wdnode["wdcode"]
-            if wdcode not in node_name_dicts:
-                node_name_dicts[wdcode] = {}
-            nodes = wdnode["nodes"]
-            for node in nodes:
-                node_name_dicts[wdcode][node["code"]] = node["name"]
-
-        # transform the datanodes and transform the data
-        datanodes = return_data["datanodes"]
-        for datanode in datanodes:
-            data = datanode["data"]["data"]
-            wds = datanode["wds"]
-            node_time, node_name = "", ""
-            for wd in wds:
-                if wd["wdcode"] == "zb":
-                    node_name = node_name_dicts[wd["wdcode"]][wd["valuecode"]]
-                elif wd["wdcode"] == "sj":
-                    node_time = wd["valuecode"]
-            if node_name == "" or node_time == "":
-                raise ValueError("数据节点缺少必要的时间或名称信息。")
-
-            # insert the data into the database
-            cursor = conn.cursor()
-            # Check if the dataset_id exists in the datasets table
-            cursor.execute("SELECT 1 FROM datasets WHERE dataset_id = ?", (dataset_id,))
-            if cursor.fetchone() is None:
-                raise ValueError(f"数据集ID {dataset_id} 不存在于数据库中，可能需要重新初始化数据库。")
-
-            # insert or update the data point in the data_points table
-            cursor.execute("""
-                INSERT INTO data_points (dataset_id, time, name, value)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(dataset_id, time, name) DO UPDATE SET value=excluded.value
-            """, (dataset_id, node_time, node_name, data))
-            conn.commit()
-
-        messagebox.showinfo("成功", f"成功获取了{len(datanodes)}条数据并存储于数据库中。")
+        # 只统计阻塞主循环的爬取过程，不包括之后的对话框
+        with ui_watchdog.timed("fetch_data"):
+            written, skipped, failures = fetch_dataset(dataset_id, time_scope, dbcode=current_dbcode, region=region)
+        summary = f"成功获取了{written + skipped}条数据，写入{written}条，{skipped}条未变化已跳过。"
+        if failures:
+            failed_chunks = ", ".join(f"{chunk}({e})" for chunk, e in failures)
+            messagebox.showwarning("部分失败", f"{summary}\n但以下时间段获取失败: {failed_chunks}")
+        else:
+            messagebox.showinfo("成功", summary)
     except sqlite3.Error as e:
         messagebox.showerror('数据库错误', f"在获取数据的过程中发生了数据库错误: {str(e)}")
     except Exception as e:
         messagebox.showerror('错误', f"在获取数据的过程中发生了未知错误: {str(e)}")
     finally:
-        conn.close()
+        update_prefetch_stats()
+
+
+def format_results(rows: list[tuple[str, str, str, float]], dbcode: str = DEFAULT_DBCODE) -> str:
+    """Formats query results of a source database into the text shown in the text area."""
+    if not rows:
+        return "未找到匹配的数据。\n"
+
+    # 不经过 get_full_name_by_id，避免在计时的查询中弹出对话框；目录中已删除的数据集显示为空名称
+    catalog = get_catalog(dbcode)
+    full_names = {}
+    lines = []
+    for row in rows:
+        if row[0] not in full_names:
+            full_names[row[0]] = catalog.full_name(row[0]) if row[0] in catalog else ""
+        lines.append(f"数据集: {full_names[row[0]]}, 组ID:{row[0]},时间: {row[1]}, 名称: {row[2]}, 值: {row[3]}\n")
+    return "".join(lines)
+
+
+@ui_watchdog.track()
+def show_results(rows: list[tuple[str, str, str, float]], text: str = None):
+    """Displays query results in the text area and keeps them for visualization.
+
+    **Global Variables**:
+        - previous_results (list): Stores the results of the last query for potential use in visualization.
+
+    Args:
+        rows (list[tuple[str, str, str, float]]): The data points of the selected source database as
+            `(dataset_id, time, name, value)` tuples.
+        text (str): The already formatted text of `rows`, formatted with `format_results` if not given.
+    """
+    global previous_results
+    previous_results = rows
+
+    text_area.config(state=tk.NORMAL)  # 临时启用来允许编辑
+    # 清空文本区域并一次性插入查询结果
+    text_area.delete(1.0, tk.END)
+    text_area.insert(tk.END, text if text is not None else format_results(rows, current_dbcode))
+    text_area.config(state=tk.DISABLED)  # 设为禁用状态后，无法编辑，但可以复制
+
+
+class QueryCache:
+    """
+    QueryCache is a bounded LRU cache of `retrieve_data` results.
+
+    Every entry remembers the data version (see `bump_data_version`) it was computed at. An entry is only
+    returned while that version is still current, so results stay correct after new data is fetched, while
+    searches that do not touch the updated dataset keep being served from the cache.
+
+    Attributes:
+        max_entries (int): The maximum number of cached queries.
+        hits (int): The number of lookups served from the cache.
+        misses (int): The number of lookups that had to query the database.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()  # clear 也会在后台的目录同步线程中调用
+
+    def get(self, key, version: int):
+        """Returns the cached `(rows, text)` of `key` if it was computed at `version`, otherwise None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, version: int, rows: list, text: str):
+        with self._lock:
+            self._entries[key] = (version, rows, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_cache = QueryCache()
 
 
 # 从数据库中提取数据
@@ -350,9 +1814,12 @@ def retrieve_data():
     This function queries the SQLite database for data points based on user-provided
     search criteria (dataset name or dataset ID). The results are displayed in the
     text area of the GUI. If no matching data is found, a message is displayed.
+    Only the partition of the selected source database is searched (see `partition_path`), and in a regional
+    database only the data of the region entered in `region_input`.
 
-    **Global Variables**:
-        - previous_results (list): Stores the results of the last query for potential use in visualization.
+    Results are cached in `query_cache` under the source database and the normalized search criteria. A cached
+    result is reused as long as the data version of the searched dataset (or of the whole table, if no dataset
+    ID is given) has not changed since.
 
     Raises:
         sqlite3.Error: If an error occurs during database operations.
@@ -360,55 +1827,48 @@ def retrieve_data():
     Returns:
         None
     """
-    global previous_results
-    conn = sqlite3.connect(db_path)
+    dbcode = current_dbcode
+    region = resolve_region(dbcode, region_input.get().strip() or None) or ""
+    conn = sqlite3.connect(partition_path(dbcode))
     cursor = conn.cursor()
 
-    search_name = search_name_input.get()
-    search_id = search_id_input.get()
+    # LIKE 对 ASCII 字符不区分大小写，因此名称统一转为小写作为缓存键
+    search_name = search_name_input.get().strip()
+    search_id = search_id_input.get().strip()
+    key = (dbcode, region, search_name.lower(), search_id)
     try:
-        # step 1: filter by dataset name if specified
-        if search_name != "":
-            cursor.execute("""
+        # 只统计阻塞主循环的查询与显示，不包括出错时的对话框
+        with ui_watchdog.timed("retrieve_data"):
+            # step 1: reuse the cached result if the searched data has not changed since
+            version = get_data_version(cursor, search_id if search_id != "" else ALL_DATASETS)
+            cached = query_cache.get(key, version)
+            if cached is not None:
+                show_results(*cached)
+                return
+
+            # step 2: filter by region, and by dataset ID and name if specified
+            conditions, parameters = ["region = ?"], [region]
+            if search_id != "":
+                conditions.append("dataset_id = ?")
+                parameters.append(search_id)
+            if search_name != "":
+                conditions.append("name LIKE ?")
+                parameters.append(f"%{search_name}%")
+            where_clause = f"WHERE {' AND '.join(conditions)}"
+            # 按名称查询时按时间排序，否则按数据集排序
+            order_by = "time" if search_name != "" else "dataset_id"
+            cursor.execute(f"""
                 SELECT dataset_id, time, name, value
                 FROM data_points
-                WHERE name LIKE ?
-                ORDER BY time
-            """, (f"%{search_name}%",))
+                {where_clause}
+                ORDER BY {order_by}
+            """, parameters)
+            rows = cursor.fetchall()
 
-        else:
-            # 查询数据点表中的所有数据
-            cursor.execute("""
-                       SELECT dataset_id, time, name, value
-                       FROM data_points
-                       ORDER BY dataset_id
-                   """, ())
-
-        rows = cursor.fetchall()
-
-        # step 2: filter by dataset_id if specified
-        if search_id != "":
-            filtered_rows = []
-            for row in rows:
-                if row[0] == search_id:
-                    filtered_rows.append(row)
-            rows = filtered_rows
-
-        previous_results = rows
-
-        text_area.config(state=tk.NORMAL)  # 临时启用来允许编辑
-        # 清空文本区域并显示查询结果
-        text_area.delete(1.0, tk.END)
-
-        # step 3: if the rows is not empty, display the results
-        if rows:
-            for row in rows:
-                text_area.insert(tk.END, f"数据集: {get_full_name_by_id(row[0])}, "
-                                         f"组ID:{row[0]},时间: {row[1]}, 名称: {row[2]}, 值: {row[3]}\n")
-        else:
-            text_area.insert(tk.END, "未找到匹配的数据。\n")
-
-        text_area.config(state=tk.DISABLED)  # 设为禁用状态后，无法编辑，但可以复制
+            # step 3: display and cache the results
+            text = format_results(rows, dbcode)
+            query_cache.put(key, version, rows, text)
+            show_results(rows, text)
 
     except sqlite3.Error as e:
         messagebox.showerror("Error", f"查询数据时出错: {e}")
@@ -448,34 +1908,210 @@ def visualize_data():
         messagebox.showerror("Error", "当前仅支持单一指标的可视化。")
         return
 
-    # 检查是否已有图表，如果没有则创建
-    if not plt.get_fignums():
-        plt.figure(figsize=(10, 5))
+    # 数据集不存在时会弹出对话框，因此在计时之前获取名称
+    dataset_name = get_name_by_id(rows[0][0], current_dbcode)
+
+    # 只统计阻塞主循环的绘图过程，不包括之前的对话框
+    with ui_watchdog.timed("visualize_data"):
+        # 检查是否已有图表，如果没有则创建
+        if not plt.get_fignums():
+            plt.figure(figsize=(10, 5))
+
+        # 设置字体支持中文
+        mpl.rcParams['font.sans-serif'] = ['Microsoft YaHei']  # 使用黑体
+        mpl.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+
+        # 在当前图表上绘制
+        plt.plot(times, values, marker='o', label=names[0])
+        plt.xlabel("时间")
+        plt.ylabel("值")
+        plt.title(f"数据集 {dataset_name} 的可视化")
+        plt.legend()
+        plt.grid(True)
+        plt.gcf().autofmt_xdate(rotation=45)  # 自动调整x轴标签以防重叠
+        plt.tight_layout()  # 调整布局
+
+        try:
+            fig_canvas.get_tk_widget().destroy()
+        except AttributeError:
+            pass
+
+        # 在Tkinter中显示图表
+        fig_canvas = FigureCanvasTkAgg(plt.gcf(), master=viz_group)
+        # 使用 pack 将图表小部件放入 fig_canvas 框架中并使其填满
+        fig_canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        fig_canvas.draw()
+
+
+# 批量渲染报告时使用的图表尺寸与字体
+REPORT_FIGSIZE = (10, 5)
+REPORT_DPI = 100
+REPORT_MAX_XTICKS = 24
+REPORT_FONTS = ['Microsoft YaHei', 'SimHei', 'Noto Sans CJK SC', 'WenQuanYi Micro Hei', 'DejaVu Sans']
 
-    # 设置字体支持中文
-    mpl.rcParams['font.sans-serif'] = ['Microsoft YaHei']  # 使用黑体
+
+def _init_render_worker():
+    """Initializes a render worker process: sets up fonts that support Chinese."""
+    mpl.rcParams['font.sans-serif'] = REPORT_FONTS
     mpl.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
-    # 在当前图表上绘制
-    plt.plot(times, values, marker='o', label=names[0])
-    plt.xlabel("时间")
-    plt.ylabel("值")
-    plt.title(f"数据集 {get_name_by_id(rows[0][0])} 的可视化")
-    plt.legend()
-    plt.grid(True)
-    plt.gcf().autofmt_xdate(rotation=45)  # 自动调整x轴标签以防重叠
-    plt.tight_layout()  # 调整布局
 
+def render_chart(task: dict) -> list[str]:
+    """
+    Renders a single chart to image files without any GUI or pyplot global state.
+
+    Every call creates its own `Figure` attached to an Agg canvas, so it is safe to run in worker processes.
+
+    Args:
+        task (dict): The chart description with the keys `out_dir`, `file_stem`, `title`, `label`,
+            `times`, `values` and `formats` (e.g. `("png", "svg")`).
+
+    Returns:
+        list[str]: The names of the written files, relative to `out_dir`.
+    """
+    fig = Figure(figsize=REPORT_FIGSIZE, dpi=REPORT_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(task["times"], task["values"], marker='o', label=task["label"])
+    ax.set_xlabel("时间")
+    ax.set_ylabel("值")
+    ax.set_title(task["title"])
+    ax.legend()
+    ax.grid(True)
+    # 时间较多时只标注部分刻度，避免上百个刻度标签拖慢渲染
+    ax.xaxis.set_major_locator(MaxNLocator(nbins=REPORT_MAX_XTICKS))
+    fig.autofmt_xdate(rotation=45)  # 自动调整x轴标签以防重叠
+    fig.tight_layout()
+
+    file_names = []
+    for file_format in task["formats"]:
+        file_name = f"{task['file_stem']}.{file_format}"
+        fig.savefig(os.path.join(task["out_dir"], file_name), format=file_format)
+        file_names.append(file_name)
+    return file_names
+
+
+def build_report_tasks(targets: list[str], out_dir: str, formats=("png",), dbcode: str = DEFAULT_DBCODE,
+                       region: str = None) -> list[dict]:
+    """
+    Builds one chart task per indicator series for the given targets.
+
+    Args:
+        targets (list[str]): Dataset IDs (every indicator of the dataset gets a chart) or indicator names
+            (every dataset containing that indicator gets a chart).
+        out_dir (str): The directory the charts will be written to.
+        formats (Iterable[str]): The image formats to write, e.g. `("png", "svg")`.
+        dbcode (str): The source database whose partition is read.
+        region (str): The region to chart in a regional database, see `resolve_region`.
+
+    Raises:
+        sqlite3.Error: If an error occurs during database operations.
+
+    Returns:
+        list[dict]: The tasks for `render_chart`, in the order of the targets.
+    """
+    catalog = get_catalog(dbcode)
+    region = resolve_region(dbcode, region)
+    conn = sqlite3.connect(partition_path(dbcode))
     try:
-        fig_canvas.get_tk_widget().destroy()
-    except AttributeError:
-        pass
+        cursor = conn.cursor()
+        tasks = []
+        for target in targets:
+            if target in catalog:
+                cursor.execute("""
+                    SELECT dataset_id, time, name, value
+                    FROM data_points
+                    WHERE dataset_id = ? AND region = ?
+                    ORDER BY name, time
+                """, (target, region or ""))
+            else:
+                cursor.execute("""
+                    SELECT dataset_id, time, name, value
+                    FROM data_points
+                    WHERE name = ? AND region = ?
+                    ORDER BY dataset_id, time
+                """, (target, region or ""))
+
+            series = {}
+            for dataset_id, node_time, name, value in cursor.fetchall():
+                series.setdefault((dataset_id, name), ([], []))
+                series[(dataset_id, name)][0].append(node_time)
+                series[(dataset_id, name)][1].append(value)
+            if not series:
+                print(f"No stored data for {target}, skipping.")
+
+            for (dataset_id, name), (times, values) in series.items():
+                dataset_name = catalog.name(dataset_id) if dataset_id in catalog else dataset_id
+                tasks.append({
+                    "out_dir": out_dir,
+                    # 文件名只使用序号，避免指标名称中的特殊字符
+                    "file_stem": f"{len(tasks) + 1:04d}_{dataset_id}",
+                    "title": f"数据集 {dataset_name} 的可视化" + (f" (地区 {region})" if region else ""),
+                    "label": name,
+                    "dataset_id": dataset_id,
+                    "times": times,
+                    "values": values,
+                    "formats": tuple(formats),
+                })
+        return tasks
+    finally:
+        conn.close()
 
-    # 在Tkinter中显示图表
-    fig_canvas = FigureCanvasTkAgg(plt.gcf(), master=viz_group)
-    # 使用 pack 将图表小部件放入 fig_canvas 框架中并使其填满
-    fig_canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-    fig_canvas.draw()
+
+def render_report(targets: list[str], out_dir: str, formats=("png",), max_workers: int = None,
+                  dbcode: str = DEFAULT_DBCODE, region: str = None) -> str:
+    """
+    Renders a report pack of charts in parallel and writes an index page linking all of them.
+
+    The charts are rendered headlessly by `render_chart` in a process pool, one figure per task, so the
+    throughput scales with the number of CPU cores.
+
+    Args:
+        targets (list[str]): Dataset IDs or indicator names, see `build_report_tasks`.
+        out_dir (str): The directory to write the charts and `index.html` to, created if necessary.
+        formats (Iterable[str]): The image formats to write, e.g. `("png", "svg")`.
+        max_workers (int): The number of worker processes, defaults to the number of CPU cores.
+        dbcode (str): The source database to report on.
+        region (str): The region to report on in a regional database, see `resolve_region`.
+
+    Raises:
+        sqlite3.Error: If an error occurs during database operations.
+
+    Returns:
+        str: The path of the written `index.html`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = build_report_tasks(targets, out_dir, formats, dbcode, region)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_render_worker) as executor:
+        chunk_size = max(1, len(tasks) // ((max_workers or os.cpu_count() or 1) * 4))
+        results = list(executor.map(render_chart, tasks, chunksize=chunk_size))
+    print(f"Rendered {len(tasks)} charts in {time.perf_counter() - start:.2f}s.")
+
+    entries = []
+    for task, file_names in zip(tasks, results):
+        links = " | ".join(f'<a href="{html.escape(name)}">{html.escape(name.rsplit(".", 1)[1].upper())}</a>'
+                           for name in file_names)
+        entries.append(f"""<section>
+<h2>{html.escape(task["title"])} - {html.escape(task["label"])} ({html.escape(task["dataset_id"])})</h2>
+<img src="{html.escape(file_names[0])}" alt="{html.escape(task["label"])}" loading="lazy">
+<p>{links}</p>
+</section>""")
+
+    index_path = os.path.join(out_dir, "index.html")
+    with open(index_path, "w", encoding="utf-8") as f:
+        f.write(f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head><meta charset="utf-8"><title>数据图表报告</title></head>
+<body>
+<h1>数据图表报告</h1>
+<p>数据库: {html.escape(DATABASES[dbcode])} ({dbcode})，生成时间: {time.strftime("%Y-%m-%d %H:%M:%S")}，共 {len(tasks)} 张图表。</p>
+{chr(10).join(entries)}
+</body>
+</html>
+""")
+    return index_path
 
 
 # =============================================================
@@ -487,11 +2123,60 @@ def visualize_data():
     root,
     dataset_id_input,
     time_scope_input,
+    region_input,
     search_id_input,
     search_name_input,
     text_area,
-    fig_canvas
-) = None, None, None, None, None, None, None
+    fig_canvas,
+    prefetch_enabled,
+    prefetch_stats_label
+) = None, None, None, None, None, None, None, None, None, None
+
+
+def select_database(dbcode: str):
+    """Switches the GUI to another source database; completions, fetches and queries then use its partition."""
+    global current_dbcode
+    current_dbcode = dbcode
+    try:
+        catalog = get_catalog(dbcode)
+    except sqlite3.Error as e:
+        messagebox.showerror("数据库错误", f"无法加载{DATABASES[dbcode]}的数据集列表: {e}")
+        catalog = Catalog([])
+    dataset_id_input.set_completion_list(catalog)
+    search_id_input.set_completion_list(catalog)
+    region_input.config(state=tk.NORMAL if is_regional(dbcode) else tk.DISABLED)
+    show_results([], "")  # 清空上一个数据库的查询结果
+
+
+def on_dataset_selected(dataset_id: str):
+    """Starts a speculative prefetch of the dataset selected in `dataset_id_input`, if prefetching is enabled."""
+    if prefetcher is not None:
+        prefetcher.request(dataset_id, current_dbcode, region_input.get().strip() or None)
+        update_prefetch_stats()
+
+
+def toggle_prefetch():
+    """Enables or disables speculative prefetching according to the `prefetch_enabled` checkbox."""
+    global prefetcher
+    if prefetch_enabled.get():
+        if prefetcher is None:
+            prefetcher = Prefetcher()
+    elif prefetcher is not None:
+        prefetcher.close()
+        prefetcher = None
+    update_prefetch_stats()
+
+
+def update_prefetch_stats():
+    """Shows the prefetch counters in the GUI."""
+    if prefetch_stats_label is None:
+        return
+    if prefetcher is None:
+        prefetch_stats_label.config(text="预取未启用")
+        return
+    stats = prefetcher.stats()
+    prefetch_stats_label.config(text=f"预取: 发起 {stats['issued']} | 命中 {stats['hits']} | 未命中 {stats['misses']} | "
+                                     f"浪费 {stats['wasted']} | 命中率 {stats['hit_rate']:.0%}")
 
 
 class AutocompleteEntry(ttk.Entry):
@@ -503,11 +2188,12 @@ class AutocompleteEntry(ttk.Entry):
         - Supports fuzzy search by ID or name.
         - Shows dropdown options in the format "ID - Name".
 
-    Attributes: master (tk.Widget): The parent widget. completion_dict (dict): A dictionary where keys are IDs and
-    values are names, e.g., {'A0101': 'Economic Accounting'}. kwargs: Additional parameters for ttk.Entry.
+    Attributes: master (tk.Widget): The parent widget. catalog (Catalog): The shared catalog whose leaf datasets
+    are offered as completions. on_select (Callable[[str], None]): Called with the ID of a selected item.
+    kwargs: Additional parameters for ttk.Entry.
 
     Methods:
-        set_completion_list(completion_dict):
+        set_completion_list(catalog):
             Updates the autocomplete data source.
 
         _on_focus_in(event):
@@ -538,16 +2224,19 @@ class AutocompleteEntry(ttk.Entry):
             Handles mouse click events to select an item from the autocomplete dropdown.
     """
 
-    def __init__(self, master=None, completion_dict=None, **kwargs):
+    def __init__(self, master=None, catalog=None, on_select=None, **kwargs):
         """
-        Args: master (tk.Widget): The parent widget. completion_dict (dict): A dictionary where keys are IDs and
-        values are names, e.g., {'A0101': 'Economic Accounting'}. **kwargs: Additional parameters for `ttk.Entry`.
+        Args: master (tk.Widget): The parent widget. catalog (Catalog): The shared catalog whose leaf datasets
+        are offered as completions. on_select (Callable[[str], None]): Called with the ID of a selected item.
+        **kwargs: Additional parameters for `ttk.Entry`.
         """
 
         super().__init__(master, **kwargs)
 
-        self._completion_list = []
-        self.set_completion_list(completion_dict if completion_dict else {})
+        self.on_select = on_select
+
+        self._catalog = None
+        self.set_completion_list(catalog if catalog else Catalog([]))
 
         self._hits = []
         self._hit_index = 0
@@ -560,16 +2249,15 @@ class AutocompleteEntry(ttk.Entry):
         # 绑定焦点移出事件，用于销毁下拉窗口
         self.bind('<FocusOut>', self._on_focus_out)
 
-    def set_completion_list(self, completion_dict):
+    def set_completion_list(self, catalog):
         """
         Updates the autocomplete data source.
 
         Args:
-            completion_dict (dict): A dictionary where keys are dataset IDs and values are dataset names.
-                Example: {'A0101': '国民经济核算', ...}.
+            catalog (Catalog): The catalog whose leaf datasets are offered as completions. The catalog is
+                shared, not copied, so several widgets can use the same instance.
         """
-        # 将字典转换为元组列表 [(id, name), ...] 以便排序和搜索
-        self._completion_list = sorted(list(completion_dict.items()), key=lambda x: x[0])
+        self._catalog = catalog
 
     def _on_focus_in(self, event):
         """当输入框获得焦点时调用"""
@@ -636,6 +2324,7 @@ class AutocompleteEntry(ttk.Entry):
         # 对于其他按键，更新补全列表
         self._update_autocomplete()
 
+    @ui_watchdog.track()
     def _update_autocomplete(self, show_all=False):
         """根据当前输入更新并显示补全列表。"""
         if self.toplevel:
@@ -645,15 +2334,12 @@ class AutocompleteEntry(ttk.Entry):
         current_text = self.get().lower()
 
         if show_all:
-            self._hits = self._completion_list
+            self._hits = self._catalog.leaves
         else:
             if not current_text:
                 return
             # 需求2：同时搜索ID和名称
-            self._hits = [
-                item for item in self._completion_list
-                if current_text in item[0].lower() or current_text in item[1].lower()
-            ]
+            self._hits = self._catalog.search(current_text)
 
         if self._hits:
             self._hit_index = 0
@@ -669,7 +2355,7 @@ class AutocompleteEntry(ttk.Entry):
 
         Attributes:
             self.toplevel (tk.Toplevel): The autocomplete dropdown widget.
-            self._hits (list): The list of autocomplete suggestions.
+            self._hits (list): The catalog indices of the autocomplete suggestions.
 
         Raises:
             None
@@ -689,8 +2375,8 @@ class AutocompleteEntry(ttk.Entry):
                              width=self.cget('width') + 15)
         listbox.pack(fill=tk.BOTH, expand=True)
 
-        for item_id, item_name in self._hits:
-            listbox.insert(tk.END, f"{item_id} - {item_name}")
+        catalog = self._catalog
+        listbox.insert(tk.END, *(f"{catalog.ids[index]} - {catalog.name_at(index)}" for index in self._hits))
 
         listbox.selection_set(0)
 
@@ -732,12 +2418,12 @@ class AutocompleteEntry(ttk.Entry):
         """Selects the currently highlighted item in the autocomplete dropdown.
 
         This method retrieves the selected item from the autocomplete dropdown, updates the input field
-        with the selected value, and ensures the dropdown is closed. It also refocuses the input field
-        and moves the cursor to the end of the text.
+        with the selected value, and ensures the dropdown is closed. It also refocuses the input field,
+        moves the cursor to the end of the text and calls `on_select` with the selected ID.
 
         Attributes:
             self.toplevel (tk.Toplevel): The autocomplete dropdown widget.
-            self._hits (list): The list of autocomplete suggestions.
+            self._hits (list): The catalog indices of the autocomplete suggestions.
 
         Raises:
             None
@@ -747,7 +2433,7 @@ class AutocompleteEntry(ttk.Entry):
         """
         if self.toplevel and self._hits:
             # 1. 获取选中的ID
-            selected_id = self._hits[self._hit_index][0]
+            selected_id = self._catalog.ids[self._hits[self._hit_index]]
 
             # 2. 销毁窗口
             self.toplevel.destroy()
@@ -761,6 +2447,10 @@ class AutocompleteEntry(ttk.Entry):
             self.focus_set()
             self.icursor(tk.END)  # 将光标移动到末尾
 
+            # 5. 通知选择回调
+            if self.on_select:
+                self.on_select(selected_id)
+
     def _on_click(self, event):
         """
         Handles mouse click events on the autocomplete dropdown.
@@ -797,8 +2487,171 @@ class AutocompleteEntry(ttk.Entry):
         self._select_item()
 
 
+class CatalogBrowser(tk.Toplevel):
+    """
+    CatalogBrowser is a window that shows the dataset catalog as a lazily expanding tree.
+
+    Only the top-level nodes are loaded when the window opens. The children of a node are loaded from the
+    `catalog_nodes` table the first time the node is expanded. The window shows the catalog of the source
+    database that was selected when it was opened.
+
+    **Features**:
+        - Double-click (or "用于爬取") on a leaf dataset fills its ID into the fetch input.
+        - "查询子树数据" shows all stored data of the selected subtree in the result area.
+    """
+
+    _PLACEHOLDER = "__placeholder__"
+
+    def __init__(self, master=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.dbcode = current_dbcode
+        self.title(f"数据目录 - {DATABASES[self.dbcode]}")
+        self.geometry("480x520")
+
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.tree = ttk.Treeview(tree_frame, show="tree", selectmode="browse")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        button_frame = ttk.Frame(self)
+        button_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        ttk.Button(button_frame, text="用于爬取", command=self._use_for_fetch).pack(side=tk.LEFT, expand=True,
+                                                                                 fill=tk.X)
+        ttk.Button(button_frame, text="查询子树数据", command=self._show_subtree_data).pack(side=tk.LEFT,
+                                                                                       expand=True, fill=tk.X)
+
+        self._leaf_ids = set()
+        self.tree.bind("<<TreeviewOpen>>", self._on_open)
+        self.tree.bind("<Double-1>", lambda e: self._use_for_fetch())
+
+        self._insert_children("", ROOT_ID)
+
+    def _insert_children(self, tree_item, parent_id: str):
+        """Loads the children of `parent_id` from the database and inserts them under `tree_item`."""
+        for node_id, name, is_parent in get_child_nodes(parent_id, self.dbcode):
+            self.tree.insert(tree_item, tk.END, iid=node_id, text=f"{node_id} - {name}")
+            if not is_parent:
+                self._leaf_ids.add(node_id)
+            else:
+                # 插入占位子节点，使其显示为可展开，展开时再加载真正的子节点
+                self.tree.insert(node_id, tk.END, iid=f"{node_id}{self._PLACEHOLDER}")
+
+    def _on_open(self, event):
+        """Replaces the placeholder of an expanded node with its real children."""
+        node_id = self.tree.focus()
+        placeholder = f"{node_id}{self._PLACEHOLDER}"
+        if self.tree.exists(placeholder):
+            self.tree.delete(placeholder)
+            self._insert_children(node_id, node_id)
+
+    def _selected_node(self):
+        selection = self.tree.selection()
+        return selection[0] if selection and not selection[0].endswith(self._PLACEHOLDER) else None
+
+    def _use_for_fetch(self):
+        """Fills the ID of the selected leaf dataset into the fetch input."""
+        node_id = self._selected_node()
+        if node_id not in self._leaf_ids:
+            return
+        if self.dbcode != current_dbcode:
+            messagebox.showinfo("提示", f"请先切换到{DATABASES[self.dbcode]}数据库。", parent=self)
+            return
+        dataset_id_input.delete(0, tk.END)
+        dataset_id_input.insert(0, node_id)
+
+    def _show_subtree_data(self):
+        """Shows all stored data points under the selected node in the result area."""
+        node_id = self._selected_node()
+        if node_id is None:
+            messagebox.showinfo("提示", "请先选择一个目录节点。", parent=self)
+            return
+        try:
+            if self.dbcode != current_dbcode:
+                messagebox.showinfo("提示", f"请先切换到{DATABASES[self.dbcode]}数据库。", parent=self)
+                return
+            show_results(get_subtree_data(node_id, self.dbcode, region_input.get().strip() or None))
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"查询数据时出错: {e}", parent=self)
+
+
+class LatencyMonitor(tk.Toplevel):
+    """
+    LatencyMonitor is a window that shows the UI latency statistics and stalls recorded by `ui_watchdog`.
+
+    **Features**:
+        - Lists the call count and the p50/p99/maximum latency of every tracked handler and of the heartbeat.
+        - Lists the most recent main loop stalls with the handler that caused them.
+        - "导出" writes both lists to a JSON file (see `UiWatchdog.dump`).
+    """
+
+    _REFRESH_MS = 1000
+
+    def __init__(self, master=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.title("界面响应监控")
+        self.geometry("640x480")
+
+        self.latency_tree = ttk.Treeview(self, columns=("count", "p50", "p99", "max"), height=6)
+        for column, heading, width in (("#0", "处理函数", 220), ("count", "调用次数", 80), ("p50", "p50 (ms)", 90),
+                                       ("p99", "p99 (ms)", 90), ("max", "最大 (ms)", 90)):
+            self.latency_tree.heading(column, text=heading)
+            self.latency_tree.column(column, width=width, anchor=tk.W if column == "#0" else tk.E)
+        self.latency_tree.pack(fill=tk.X, padx=5, pady=5)
+
+        stall_group = ttk.LabelFrame(self, text=f"卡顿记录 (延迟超过 {ui_watchdog.stall_ms:g} ms)")
+        stall_group.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.stall_tree = ttk.Treeview(stall_group, columns=("time", "lag", "handler"), show="headings")
+        for column, heading, width in (("time", "时间", 150), ("lag", "延迟 (ms)", 90), ("handler", "疑似原因", 260)):
+            self.stall_tree.heading(column, text=heading)
+            self.stall_tree.column(column, width=width)
+        scrollbar = ttk.Scrollbar(stall_group, orient=tk.VERTICAL, command=self.stall_tree.yview)
+        self.stall_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.stall_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        ttk.Button(self, text="导出", command=self._export).pack(fill=tk.X, padx=5, pady=5)
+
+        self._refresh_id = None
+        self._refresh()
+
+    def _refresh(self):
+        """Reloads both lists and schedules the next refresh while the window is open."""
+        self.latency_tree.delete(*self.latency_tree.get_children())
+        for name, stats in sorted(ui_watchdog.stats().items()):
+            self.latency_tree.insert("", tk.END, text=name, values=(stats["count"], f"{stats['p50_ms']:.1f}",
+                                                                    f"{stats['p99_ms']:.1f}",
+                                                                    f"{stats['max_ms']:.1f}"))
+        self.stall_tree.delete(*self.stall_tree.get_children())
+        for stall in reversed(ui_watchdog.stalls):
+            self.stall_tree.insert("", tk.END, values=(stall["time"], f"{stall['lag_ms']:.1f}", stall["handler"]))
+        self._refresh_id = self.after(self._REFRESH_MS, self._refresh)
+
+    def destroy(self):
+        """Cancels the pending refresh before destroying the window."""
+        if self._refresh_id is not None:
+            self.after_cancel(self._refresh_id)
+            self._refresh_id = None
+        super().destroy()
+
+    def _export(self):
+        """Asks for a file name and dumps the statistics there."""
+        path = filedialog.asksaveasfilename(parent=self, initialfile=WATCHDOG_DUMP_PATH, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            ui_watchdog.dump(path)
+            messagebox.showinfo("成功", f"已导出到 {path}", parent=self)
+        except OSError as e:
+            messagebox.showerror("Error", f"导出时出错: {e}", parent=self)
+
+
 # GUI界面
-def create_gui():
+def create_gui(dbcodes=(DEFAULT_DBCODE,)):
     """
     Creates the graphical user interface (GUI) for the application.
 
@@ -809,9 +2662,13 @@ def create_gui():
 
     The layout is enhanced using ttk widgets, padding, and logical grouping for
     a more modern and user-friendly appearance.
+
+    Args:
+        dbcodes (Sequence[str]): The initialized source databases offered in the database selector; the first
+            one is selected at start.
     """
-    global root, dataset_id_input, time_scope_input, search_id_input, \
-        search_name_input, text_area, fig_canvas, viz_group
+    global root, dataset_id_input, time_scope_input, region_input, search_id_input, \
+        search_name_input, text_area, fig_canvas, viz_group, prefetch_enabled, prefetch_stats_label, current_dbcode
 
     root = tk.Tk()
     root.title("国家统计局数据爬取与可视化工具")
@@ -826,6 +2683,27 @@ def create_gui():
     right_frame = ttk.Frame(paned_window, padding="10")
     paned_window.add(right_frame, weight=7)
 
+    # --- 0. 源数据库选择 ---
+    dbcodes = list(dbcodes)
+    current_dbcode = dbcodes[0]
+    database_frame = ttk.Frame(left_frame)
+    database_frame.pack(fill=tk.X, pady=(0, 5))
+    ttk.Label(database_frame, text="数据库:", width=12).pack(side=tk.LEFT)
+    database_input = ttk.Combobox(database_frame, state="readonly",
+                                  values=[f"{dbcode} - {DATABASES[dbcode]}" for dbcode in dbcodes])
+    database_input.current(0)
+    database_input.bind("<<ComboboxSelected>>", lambda e: select_database(dbcodes[database_input.current()]))
+    database_input.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+    # 地区代码只对分省数据库有效，爬取和查询都只针对该地区
+    region_frame = ttk.Frame(left_frame)
+    region_frame.pack(fill=tk.X, pady=(0, 10))
+    ttk.Label(region_frame, text="地区代码:", width=12).pack(side=tk.LEFT)
+    region_input = ttk.Entry(region_frame)
+    region_input.insert(0, DEFAULT_REGION)
+    region_input.config(state=tk.NORMAL if is_regional(current_dbcode) else tk.DISABLED)
+    region_input.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
     # --- 1. 数据爬取区域 ---
     fetch_group = ttk.LabelFrame(left_frame, text="数据爬取")
     fetch_group.pack(fill=tk.X, pady=(0, 10))
@@ -834,14 +2712,14 @@ def create_gui():
     dataset_id_frame.pack(fill=tk.X, padx=5, pady=5)
     ttk.Label(dataset_id_frame, text="表的序号:", width=12).pack(side=tk.LEFT)
 
-    # 获取自动补全字典
+    # 获取共享的目录对象，所有自动补全输入框共用同一个实例
     try:
-        all_datasets_dict = get_dataset_choices()
+        catalog = get_catalog(current_dbcode)
     except Exception as e:
         print(f"无法加载数据集列表：{e}")
-        all_datasets_dict = {"A01030H": "示例数据"}
+        catalog = Catalog([("A01030H", ROOT_ID, "示例数据", False)])
 
-    dataset_id_input = AutocompleteEntry(dataset_id_frame, completion_dict=all_datasets_dict, width=30)
+    dataset_id_input = AutocompleteEntry(dataset_id_frame, catalog=catalog, on_select=on_dataset_selected, width=30)
     dataset_id_input.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
     time_scope_frame = ttk.Frame(fetch_group)
@@ -857,6 +2735,15 @@ def create_gui():
     # --- ** 新增内容结束 ** ---
 
     ttk.Button(fetch_group, text="爬取数据", command=fetch_data).pack(fill=tk.X, padx=5, pady=5)
+    ttk.Button(fetch_group, text="浏览数据目录", command=lambda: CatalogBrowser(root)).pack(fill=tk.X, padx=5,
+                                                                                       pady=(0, 5))
+
+    prefetch_enabled = tk.BooleanVar(value=False)
+    ttk.Checkbutton(fetch_group, text=f"选中数据集后预取 {PREFETCH_TIME_SCOPE} 数据", variable=prefetch_enabled,
+                    command=toggle_prefetch).pack(fill=tk.X, padx=5)
+    prefetch_stats_label = ttk.Label(fetch_group, foreground="gray50")
+    prefetch_stats_label.pack(fill=tk.X, padx=5, pady=(0, 5))
+    update_prefetch_stats()
 
     # --- 2. 数据查询区域 ---
     query_group = ttk.LabelFrame(left_frame, text="本地数据查询")
@@ -866,7 +2753,7 @@ def create_gui():
     search_id_frame.pack(fill=tk.X, padx=5, pady=5)
     ttk.Label(search_id_frame, text="查询 (表序号):", width=12).pack(side=tk.LEFT)
 
-    search_id_input = AutocompleteEntry(search_id_frame, completion_dict=all_datasets_dict, width=30)
+    search_id_input = AutocompleteEntry(search_id_frame, catalog=catalog, width=30)
     search_id_input.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
     ttk.Button(search_id_frame, text="查询", command=retrieve_data).pack(side=tk.LEFT)
 
@@ -894,6 +2781,7 @@ def create_gui():
     text_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
     ttk.Button(left_frame, text="可视化选中数据", command=visualize_data).pack(fill=tk.X, pady=5)
+    ttk.Button(left_frame, text="界面响应监控", command=lambda: LatencyMonitor(root)).pack(fill=tk.X)
 
     # --- 5. 可视化图表区域 ---
     viz_group = ttk.LabelFrame(right_frame, text="数据可视化图表")
@@ -902,9 +2790,94 @@ def create_gui():
     fig_canvas = tk.Frame(viz_group)
     fig_canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
+    ui_watchdog.start(root)
     root.mainloop()
 
+    # 退出时会等待线程池中的线程结束，因此先取消尚未开始的预取请求
+    if prefetcher is not None:
+        prefetcher.close()
+
+
+def main():
+    """Entry point: starts the GUI, or runs a batch command given on the command line."""
+    parser = argparse.ArgumentParser(description="国家统计局数据爬取与可视化工具")
+    # 与各命令的 --db 区分开；每次只接受一个值，以免吞掉其后的命令名
+    parser.add_argument("--gui-db", dest="gui_dbcodes", action="append", choices=list(DATABASES),
+                        help=f"界面中使用的源数据库，可重复指定多个，其目录会并行初始化，默认为 {DEFAULT_DBCODE}")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # 只操作单个源数据库的命令共用的参数
+    db_parser = argparse.ArgumentParser(add_help=False)
+    db_parser.add_argument("--db", dest="dbcode", default=DEFAULT_DBCODE, choices=list(DATABASES),
+                           help="源数据库: " + ", ".join(f"{dbcode}={name}" for dbcode, name in DATABASES.items()))
+
+    # 命令行程序退出时会中断后台的目录同步，需要时可以先等待同步完成
+    sync_parser = argparse.ArgumentParser(add_help=False)
+    sync_parser.add_argument("--wait-sync", action="store_true",
+                             help="从种子初始化的目录尚未同步时，先等待后台同步完成再执行命令")
+
+    init_parser = subparsers.add_parser("init", parents=[sync_parser],
+                                        help="初始化源数据库，并行爬取各自的目录（不启动界面）")
+    init_parser.add_argument("--db", dest="dbcodes", nargs="+", default=list(DATABASES), choices=list(DATABASES),
+                             help="要初始化的源数据库，默认为全部")
+
+    fetch_parser = subparsers.add_parser("fetch", parents=[db_parser, sync_parser], help="爬取数据（不启动界面）")
+    fetch_parser.add_argument("dataset_ids", nargs="+", help="数据集ID")
+    fetch_parser.add_argument("-t", "--time-scope", default="last13", help="时间范围，例如 2023- 或 last13")
+    fetch_parser.add_argument("-r", "--region", default=None, help=f"分省数据库的地区代码，默认为 {DEFAULT_REGION}")
+
+    report_parser = subparsers.add_parser("report", parents=[db_parser, sync_parser], help="批量渲染图表报告（不启动界面）")
+    report_parser.add_argument("targets", nargs="+", help="数据集ID或指标名称")
+    report_parser.add_argument("-o", "--out", default="report", help="输出目录")
+    report_parser.add_argument("-f", "--format", nargs="+", default=["png"], choices=["png", "svg"],
+                               help="图片格式")
+    report_parser.add_argument("-j", "--workers", type=int, default=None, help="进程数，默认为CPU核心数")
+    report_parser.add_argument("-r", "--region", default=None, help=f"分省数据库的地区代码，默认为 {DEFAULT_REGION}")
+
+    seed_parser = subparsers.add_parser("seed-export", parents=[db_parser, sync_parser],
+                                        help="导出目录种子快照，供新数据库快速初始化")
+    seed_parser.add_argument("-o", "--out", default=None, help="输出文件，默认为该数据库的种子快照路径")
+
+    migrate_parser = subparsers.add_parser("migrate", parents=[db_parser],
+                                           help="把旧版 data_points 表迁移为紧凑的存储格式")
+    migrate_parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE, help="每个事务迁移的行数")
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        migrate_storage(partition_path(args.dbcode), args.batch_size)
+        return
+    if args.command == "init":
+        init_databases(args.dbcodes)
+    elif args.command is None:
+        args.gui_dbcodes = args.gui_dbcodes or [DEFAULT_DBCODE]
+        init_databases(args.gui_dbcodes)
+    else:
+        init_tables(dbcode=args.dbcode)
+    if getattr(args, "wait_sync", False) and _sync_threads:
+        print("Waiting for the catalog sync to finish...")
+        wait_for_catalog_sync()
+
+    if args.command == "fetch":
+        for dataset_id in args.dataset_ids:
+            written, skipped, failures = fetch_dataset(dataset_id, args.time_scope, dbcode=args.dbcode,
+                                                       region=args.region)
+            print(f"{dataset_id}: {written} rows written, {skipped} rows unchanged and skipped")
+            for chunk, e in failures:
+                print(f"{dataset_id}: failed to fetch {chunk}: {e}")
+    elif args.command == "seed-export":
+        export_catalog_seed(args.out, args.dbcode)
+    elif args.command == "report":
+        index_path = render_report(args.targets, args.out, args.format, args.workers, args.dbcode, args.region)
+        print(f"Report written to {index_path}")
+    elif args.command is None:
+        create_gui(list(dict.fromkeys(args.gui_dbcodes)))
+        return
+
+    if not wait_for_catalog_sync(timeout=0):
+        print("The catalog sync is still running and will be retried on the next start (use --wait-sync to wait).")
+
 
 if __name__ == "__main__":
-    init_tables()
-    create_gui()
+    # 打包后的程序中，render_report 的工作进程需要由此进入，而不是重新执行 main
+    multiprocessing.freeze_support()
+    main()